@@ -0,0 +1,290 @@
+import argparse
+
+import numpy as np
+
+from tools import Maze, TOP, RIGHT, BOTTOM, LEFT
+
+
+def as_walls(mazes) -> np.ndarray:
+    """Wall bits as a (batch, cols, rows) uint8 array from a Maze, a list of them or an array of 2 or 3 dimensions"""
+    if isinstance(mazes, Maze):
+        return mazes.walls[None]
+    if isinstance(mazes, (list, tuple)) and mazes and isinstance(mazes[0], Maze):
+        return np.stack([maze.walls for maze in mazes])
+    walls = np.asarray(mazes, dtype=np.uint8)
+    return walls[None] if walls.ndim == 2 else walls
+
+
+def open_passages(walls: np.ndarray) -> tuple:
+    """(east, south) booleans of shape (..., cols, rows - 1) and (..., cols - 1, rows): the passage from each cell
+    to its right or lower neighbour is open. Both cells must agree, see inconsistent_walls."""
+    east = ((walls[..., :, :-1] & RIGHT) == 0) & ((walls[..., :, 1:] & LEFT) == 0)
+    south = ((walls[..., :-1, :] & BOTTOM) == 0) & ((walls[..., 1:, :] & TOP) == 0)
+    return east, south
+
+
+def inconsistent_walls(walls: np.ndarray) -> np.ndarray:
+    """Per maze count of inner walls set on one side only"""
+    east = ((walls[..., :, :-1] & RIGHT) == 0) != ((walls[..., :, 1:] & LEFT) == 0)
+    south = ((walls[..., :-1, :] & BOTTOM) == 0) != ((walls[..., 1:, :] & TOP) == 0)
+    return east.sum(axis=(-2, -1)) + south.sum(axis=(-2, -1))
+
+
+def open_sides(walls: np.ndarray) -> tuple:
+    """(right, down, left, up) booleans of the full grid shape, outer borders count as closed"""
+    east, south = open_passages(walls)
+    right, down, left, up = (np.zeros(walls.shape, dtype=bool) for _ in range(4))
+    right[..., :, :-1] = east
+    left[..., :, 1:] = east
+    down[..., :-1, :] = south
+    up[..., 1:, :] = south
+    return right, down, left, up
+
+
+def distance_field(walls: np.ndarray, source: tuple = (0, 0)) -> np.ndarray:
+    """Steps from source to every cell, -1 where unreachable, for one maze or a batch.
+    Level-synchronous BFS: every iteration moves the whole frontier one step through the open passages.
+    A single maze goes through bfs_field, whose work does not grow with the number of levels times the grid."""
+    if walls.ndim == 2:
+        return bfs_field(walls, source)[0]
+    east, south = open_passages(walls)
+    distances = np.full(walls.shape, -1, dtype=np.int32)
+    frontier = np.zeros(walls.shape, dtype=bool)
+    frontier[..., source[0], source[1]] = True
+    reached = frontier.copy()
+    distances[..., source[0], source[1]] = 0
+
+    step = np.empty(walls.shape, dtype=bool)
+    level = 0
+    while True:
+        level += 1
+        step[:] = False
+        step[..., :, 1:] |= frontier[..., :, :-1] & east
+        step[..., :, :-1] |= frontier[..., :, 1:] & east
+        step[..., 1:, :] |= frontier[..., :-1, :] & south
+        step[..., :-1, :] |= frontier[..., 1:, :] & south
+        step &= ~reached
+        if not step.any():
+            return distances
+        reached |= step
+        np.copyto(distances, level, where=step)
+        frontier, step = step, frontier
+
+
+# Wall bit on the side of the parent after a move right, down, left or up
+PARENT_SIDES = (LEFT, TOP, RIGHT, BOTTOM)
+
+
+def bfs_field(walls, source: tuple = (0, 0), small_frontier: int = 32) -> tuple:
+    """BFS from source over one maze, returning an int32 distance map (-1 where unreachable) and a uint8
+    parent-direction map holding the wall bit (TOP, RIGHT, BOTTOM or LEFT) on the side of each cell's parent,
+    0 for the source and unreachable cells.
+    The frontier is an array of cell ids advanced a whole level per iteration with array operations.
+    Levels with fewer than small_frontier cells, e.g. long corridors, are stepped in plain Python instead,
+    where NumPy's per-call overhead would dominate; results are written back to the maps in bulk."""
+    walls = walls.walls if isinstance(walls, Maze) else np.asarray(walls)
+    cols, rows = walls.shape
+    sides = [side.ravel() for side in open_sides(walls)]
+    steps = (1, rows, -1, -rows)
+    moves = tuple(zip(sides, steps, PARENT_SIDES))
+    byte_moves = tuple(zip([side.tobytes() for side in sides], steps, PARENT_SIDES))
+
+    seen = bytearray(cols * rows)
+    seen_array = np.frombuffer(seen, dtype=np.uint8)
+    distances = np.full(cols * rows, -1, dtype=np.int32)
+    parent_sides = np.zeros(cols * rows, dtype=np.uint8)
+    source_id = source[0] * rows + source[1]
+    seen[source_id] = 1
+    distances[source_id] = 0
+
+    frontier = np.array([source_id])
+    level = 0
+    while len(frontier):
+        if len(frontier) < small_frontier:
+            frontier = frontier.tolist()
+            found, levels, found_sides = [], [], []
+            while frontier and len(frontier) < small_frontier:
+                level += 1
+                next_frontier = []
+                for cell_id in frontier:
+                    for is_open, step, side in byte_moves:
+                        if is_open[cell_id] and not seen[cell_id + step]:
+                            seen[cell_id + step] = 1
+                            next_frontier.append(cell_id + step)
+                            found_sides.append(side)
+                found.extend(next_frontier)
+                levels.extend([level] * len(next_frontier))
+                frontier = next_frontier
+            found = np.array(found, dtype=np.int64)
+            distances[found] = levels
+            parent_sides[found] = found_sides
+            frontier = np.array(frontier, dtype=np.int64)
+            continue
+
+        level += 1
+        found = []
+        for is_open, step, side in moves:
+            cells = frontier[is_open[frontier]] + step
+            cells = cells[seen_array[cells] == 0]
+            seen_array[cells] = 1
+            distances[cells] = level
+            parent_sides[cells] = side
+            found.append(cells)
+        frontier = np.concatenate(found)
+
+    return distances.reshape(cols, rows), parent_sides.reshape(cols, rows)
+
+
+def field_path(distances: np.ndarray, parent_sides: np.ndarray, end: tuple) -> np.ndarray:
+    """Cell ids from the bfs_field source to end, like the solvers' path(), empty if end is unreachable"""
+    if distances[end] < 0:
+        return np.empty(0, dtype=np.int32)
+    rows = parent_sides.shape[1]
+    flat = parent_sides.ravel()
+    offsets = {LEFT: -1, TOP: -rows, RIGHT: 1, BOTTOM: rows}
+    cell_id = end[0] * rows + end[1]
+    path = [cell_id]
+    for _ in range(distances[end]):
+        cell_id += offsets[int(flat[cell_id])]
+        path.append(cell_id)
+    return np.array(path[::-1], dtype=np.int32)
+
+
+def pack_batch(mask: np.ndarray) -> np.ndarray:
+    """(batch, cols, rows) booleans to (cols, rows, words) uint64, bit k of word w belongs to maze 64 * w + k"""
+    batch = len(mask)
+    packed = np.packbits(mask, axis=0, bitorder='little')
+    padded = np.zeros((-(-batch // 64) * 8,) + mask.shape[1:], dtype=np.uint8)
+    padded[:len(packed)] = packed
+    return np.ascontiguousarray(np.moveaxis(padded, 0, -1)).view(np.uint64)
+
+
+def unpack_batch(words: np.ndarray, batch: int) -> np.ndarray:
+    """Inverse of pack_batch for a (words,) or (..., words) array, returns booleans with the batch axis last"""
+    return np.unpackbits(words.view(np.uint8), axis=-1, bitorder='little')[..., :batch].astype(bool)
+
+
+def flood(walls: np.ndarray, start: tuple, end: tuple) -> tuple:
+    """BFS from start in every maze of the batch at once, 64 mazes per uint64 word, without building
+    distance fields. Returns (reachable cell count, steps to end or -1, steps to the farthest reachable cell)."""
+    batch = len(walls)
+    east, south = (pack_batch(passage) for passage in open_passages(walls))
+    frontier = np.zeros(walls.shape[1:] + east.shape[-1:], dtype=np.uint64)
+    frontier[start] = ~np.uint64(0)
+    reached = frontier.copy()
+    solution_length = np.full(batch, 0 if start == end else -1, dtype=np.int64)
+    max_distance = np.zeros(batch, dtype=np.int64)
+
+    step = np.empty_like(frontier)
+    level = 0
+    while True:
+        level += 1
+        step[:] = 0
+        step[:, 1:] |= frontier[:, :-1] & east
+        step[:, :-1] |= frontier[:, 1:] & east
+        step[1:, :] |= frontier[:-1, :] & south
+        step[:-1, :] |= frontier[1:, :] & south
+        step &= ~reached
+        alive = np.bitwise_or.reduce(step, axis=(0, 1))
+        if not alive.any():
+            break
+        reached |= step
+        max_distance[unpack_batch(alive, batch)] = level
+        solution_length[unpack_batch(step[end], batch)] = level
+        frontier, step = step, frontier
+
+    reachable = unpack_batch(reached, batch).sum(axis=(0, 1))
+    return reachable, solution_length, max_distance
+
+
+def field_stats(walls: np.ndarray, start: tuple, end: tuple) -> tuple:
+    """flood's results from one bfs_field per maze, whose work does not grow with levels times cells"""
+    stats = np.empty((3, len(walls)), dtype=np.int64)
+    for index, maze_walls in enumerate(walls):
+        distances = bfs_field(maze_walls, start)[0]
+        stats[:, index] = np.count_nonzero(distances >= 0), distances[end], distances.max()
+    return tuple(stats)
+
+
+# flood pays a pass over the grid per level for up to 64 mazes at once, so it only beats one bfs_field
+# per maze while cells stay below this many per maze sharing a word
+FLOOD_CELLS_PER_MAZE = 64
+
+
+def analyze_chunk(walls: np.ndarray, start: tuple, end: tuple) -> dict:
+    cells = walls.shape[-2] * walls.shape[-1]
+    right, down, left, up = open_sides(walls)
+    degrees = right.astype(np.int8) + down + left + up
+    passages = degrees.sum(axis=(-2, -1), dtype=np.int64) // 2
+
+    if cells <= FLOOD_CELLS_PER_MAZE * min(len(walls), 64):
+        reachable, solution_length, max_distance = flood(walls, start, end)
+    else:
+        reachable, solution_length, max_distance = field_stats(walls, start, end)
+    connected = reachable == cells
+
+    two = degrees == 2
+    straight = two & ((right & left) | (down & up))
+    junctions = degrees >= 3
+    junction_count = junctions.sum(axis=(-2, -1))
+    branches = np.where(junctions, degrees, 0).sum(axis=(-2, -1))
+    return {
+        'cells': np.full(len(walls), cells),
+        'passages': passages,
+        'inconsistent_walls': inconsistent_walls(walls),
+        'reachable': reachable,
+        'connected': connected,
+        'perfect': connected & (passages == cells - 1),
+        'isolated': (degrees == 0).sum(axis=(-2, -1)),
+        'dead_ends': (degrees == 1).sum(axis=(-2, -1)),
+        'corridors': two.sum(axis=(-2, -1)),
+        'straight_corridors': straight.sum(axis=(-2, -1)),
+        'turns': (two & ~straight).sum(axis=(-2, -1)),
+        'junctions': junction_count,
+        'mean_branching': np.divide(branches, junction_count, out=np.zeros(len(walls)), where=junction_count > 0),
+        'solution_length': solution_length,
+        'max_distance': max_distance,
+    }
+
+
+def analyze(mazes, start: tuple = (0, 0), end: tuple = None, chunk_size: int = 2048) -> dict:
+    """Per maze metrics as arrays of the batch length. solution_length is the number of steps from start
+    to end (bottom right by default), -1 when there is no route; mean_branching is the average degree of junctions.
+    The batch is processed chunk_size mazes at a time to keep the working arrays small. Many small mazes are
+    flooded together bit-packed, few or large ones get a bfs_field each."""
+    start = tuple(start)
+    walls = as_walls(mazes)
+    cols, rows = walls.shape[-2:]
+    end = tuple(end or (cols - 1, rows - 1))
+    chunks = [analyze_chunk(walls[index:index + chunk_size], start, end)
+              for index in range(0, len(walls), chunk_size)]
+    return {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}
+
+
+def summarize(results: dict) -> dict:
+    summary = {'mazes': len(results['cells'])}
+    for key, values in results.items():
+        if values.dtype == bool:
+            summary[key] = int(values.sum())
+        else:
+            summary[key] = {'mean': float(values.mean()), 'min': values.min().item(), 'max': values.max().item()}
+    return summary
+
+
+def main(argv=None):
+    import bulk
+
+    parser = argparse.ArgumentParser(description='Validate and measure a bulk maze file')
+    parser.add_argument('path', help='file written by bulk.py')
+    parser.add_argument('--size', type=int, nargs=2, required=True, metavar=('COLS', 'ROWS'))
+    parser.add_argument('--chunk-size', type=int, default=2048)
+    args = parser.parse_args(argv)
+
+    results = analyze(bulk.read_bulk(args.path, tuple(args.size)), chunk_size=args.chunk_size)
+    for key, value in summarize(results).items():
+        print(f'{key:<20} {value}')
+    return 0 if results['perfect'].all() else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,209 @@
+import argparse
+import inspect
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import maze_generators
+import maze_solvers
+from analysis import bfs_field
+from maze_generators import maze_filler
+from maze_graph import compile_maze
+from tools import create_empty_maze
+
+
+def algorithm_classes(module) -> dict:
+    """Every steppable class defined in the module, placeholders excluded"""
+    classes = {}
+    for name, cls in inspect.getmembers(module, inspect.isclass):
+        if cls.__module__ == module.__name__ and hasattr(cls, 'move') and not name.startswith('Placeholder'):
+            classes[name] = cls
+    return classes
+
+
+def parse_size(text: str) -> tuple:
+    if 'x' in text:
+        cols, rows = text.split('x')
+        return int(cols), int(rows)
+    return int(text), int(text)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def peak_memory(function, *args) -> tuple:
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak, result
+
+
+def generate(generator_class, size: tuple, seed: int):
+    maze = create_empty_maze(*size)
+    generator = generator_class(size, rng=random.Random(seed))
+    maze_filler(maze, generator)
+    return maze
+
+
+def count_generator_steps(generator_class, size: tuple, seed: int) -> int:
+    maze = create_empty_maze(*size)
+    generator = generator_class(size, rng=random.Random(seed))
+    steps = 0
+    while generator.not_finished:
+        maze_filler(maze, generator, step_by_step=True)
+        steps += 1
+    return steps
+
+
+def solve(solver_class, graph):
+    solver = solver_class(graph)
+    solver.solve()
+    return solver.nodes_expanded
+
+
+def make_result(kind: str, name: str, size: tuple, seed: int, wall_time: float, steps: int, memory) -> dict:
+    cells = size[0] * size[1]
+    return {
+        'kind': kind,
+        'name': name,
+        'size': list(size),
+        'seed': seed,
+        'wall_time': wall_time,
+        'steps': steps,
+        'steps_per_second': steps / wall_time if wall_time else None,
+        'cells_per_second': cells / wall_time if wall_time else None,
+        'peak_memory': memory,
+    }
+
+
+def bench_generator(generator_class, size: tuple, seed: int, repeat: int = 1, memory: bool = True) -> dict:
+    wall_time = min(timed(generate, generator_class, size, seed)[0] for _ in range(repeat))
+    steps = count_generator_steps(generator_class, size, seed)
+    peak = peak_memory(generate, generator_class, size, seed)[0] if memory else None
+    return make_result('generator', generator_class.__name__, size, seed, wall_time, steps, peak)
+
+
+def bench_solver(solver_class, graph, size: tuple, seed: int, repeat: int = 1, memory: bool = True) -> dict:
+    runs = [timed(solve, solver_class, graph) for _ in range(repeat)]
+    wall_time = min(run[0] for run in runs)
+    steps = runs[0][1]
+    peak = peak_memory(solve, solver_class, graph)[0] if memory else None
+    return make_result('solver', solver_class.__name__, size, seed, wall_time, steps, peak)
+
+
+def run_benchmarks(generators: dict, solvers: dict, sizes: list, seeds: list, maze_generator,
+                   repeat: int = 1, memory: bool = True, log=None) -> list:
+    results = []
+    for size in sizes:
+        for seed in seeds:
+            for generator_class in generators.values():
+                results.append(bench_generator(generator_class, size, seed, repeat, memory))
+                if log:
+                    log(results[-1])
+
+            if not solvers:
+                continue
+            maze = generate(maze_generator, size, seed)
+            compile_time, graph = timed(compile_maze, maze)
+            cells = graph.cols * graph.rows
+            results.append(make_result('compile', 'compile_maze', size, seed, compile_time, cells, None))
+            if log:
+                log(results[-1])
+            field_time = timed(bfs_field, maze)[0]
+            results.append(make_result('field', 'bfs_field', size, seed, field_time, cells, None))
+            if log:
+                log(results[-1])
+            for solver_class in solvers.values():
+                results.append(bench_solver(solver_class, graph, size, seed, repeat, memory))
+                if log:
+                    log(results[-1])
+    return results
+
+
+def result_key(result: dict) -> tuple:
+    return result['kind'], result['name'], tuple(result['size']), result['seed']
+
+
+def compare(results: list, baseline: list, threshold: float) -> list:
+    """Pair results with the baseline and return (result, ratio) for runs slower than 1 + threshold"""
+    baseline_times = {result_key(result): result['wall_time'] for result in baseline}
+    regressions = []
+    for result in results:
+        old_time = baseline_times.get(result_key(result))
+        if not old_time:
+            continue
+        ratio = result['wall_time'] / old_time
+        result['baseline_ratio'] = ratio
+        if ratio > 1 + threshold:
+            regressions.append((result, ratio))
+    return regressions
+
+
+def format_result(result: dict) -> str:
+    cols, rows = result['size']
+    memory = result['peak_memory']
+    memory_text = f'{memory / 2 ** 20:8.2f} MiB' if memory is not None else '       - MiB'
+    return (f"{result['kind']:<9} {result['name']:<18} {cols:>5}x{rows:<5} seed {result['seed']:<4}"
+            f"{result['wall_time']:10.4f} s {result['steps_per_second']:14,.0f} steps/s "
+            f"{result['cells_per_second']:14,.0f} cells/s {memory_text}")
+
+
+def main(argv=None):
+    generators = algorithm_classes(maze_generators)
+    solvers = algorithm_classes(maze_solvers)
+
+    parser = argparse.ArgumentParser(description='Time every maze generator and solver over a matrix of sizes')
+    parser.add_argument('--sizes', nargs='+', default=['50', '100', '200'], help='N or COLSxROWS')
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0])
+    parser.add_argument('--generators', nargs='*', default=list(generators), choices=list(generators))
+    parser.add_argument('--solvers', nargs='*', default=list(solvers), choices=list(solvers))
+    parser.add_argument('--maze-generator', default='RandomizedDFS', choices=list(generators),
+                        help='generator building the mazes the solvers run on')
+    parser.add_argument('--repeat', type=int, default=1, help='keep the fastest of this many timed runs')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--baseline', help='JSON written by an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown against the baseline')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks({name: generators[name] for name in args.generators},
+                             {name: solvers[name] for name in args.solvers},
+                             [parse_size(size) for size in args.sizes], args.seeds,
+                             generators[args.maze_generator], repeat=args.repeat, memory=not args.no_memory,
+                             log=lambda result: print(format_result(result)))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for result, ratio in regressions:
+            print(f"Regression: {result['kind']} {result['name']} {result['size']} seed {result['seed']} "
+                  f"is {ratio:.2f}x the baseline time")
+        if not regressions:
+            print('No regressions against the baseline')
+
+    if args.output:
+        report = {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'results': results,
+        }
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
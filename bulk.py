@@ -0,0 +1,84 @@
+import argparse
+import random
+from collections import namedtuple
+from multiprocessing import Pool
+
+import numpy as np
+
+import maze_generators
+from maze_generators import maze_filler
+from tools import create_empty_maze
+
+MazeJob = namedtuple('MazeJob', ['generator_class', 'size', 'seed'])
+
+
+def generate_maze(job: MazeJob):
+    """Build one maze with its own RNG, so the result depends only on the job"""
+    cols, rows = job.size
+    maze = create_empty_maze(cols, rows)
+    generator = job.generator_class(job.size, rng=random.Random(job.seed))
+    maze_filler(maze, generator)
+    return maze
+
+
+def _indexed_generate(indexed_job):
+    index, job = indexed_job
+    return index, generate_maze(job)
+
+
+def make_jobs(generator_class, size: tuple, count: int, base_seed: int = 0) -> list:
+    return [MazeJob(generator_class, size, base_seed + i) for i in range(count)]
+
+
+def generate_bulk(jobs, workers: int = None, ordered: bool = True, chunksize: int = 8):
+    """Yield (job index, maze) pairs, in job order or as soon as each maze is finished"""
+    indexed_jobs = enumerate(jobs)
+    if workers == 1:
+        yield from map(_indexed_generate, indexed_jobs)
+        return
+
+    with Pool(workers) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        yield from imap(_indexed_generate, indexed_jobs, chunksize)
+
+
+def write_bulk(path, jobs, workers: int = None, ordered: bool = True):
+    """Write every maze's wall bytes at a fixed offset, so the file is identical for any worker count"""
+    jobs = list(jobs)
+    cols, rows = jobs[0].size
+    record_size = cols * rows
+    if any(job.size != (cols, rows) for job in jobs):
+        raise ValueError('All jobs written to one file must share the same size')
+
+    with open(path, 'wb') as file:
+        file.truncate(record_size * len(jobs))
+        for index, maze in generate_bulk(jobs, workers=workers, ordered=ordered):
+            file.seek(index * record_size)
+            file.write(maze.walls.tobytes())
+
+
+def read_bulk(path, size: tuple):
+    """Memory-mapped (count, cols, rows) view of the wall records in a file written by write_bulk"""
+    cols, rows = size
+    return np.memmap(path, dtype=np.uint8, mode='r').reshape(-1, cols, rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate many mazes in parallel with deterministic seeds')
+    parser.add_argument('generator', help='generator class name, e.g. RandomizedDFS')
+    parser.add_argument('--size', type=int, nargs=2, default=(20, 20), metavar=('COLS', 'ROWS'))
+    parser.add_argument('--count', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first job, job i uses seed + i')
+    parser.add_argument('--workers', type=int, default=None, help='process count, defaults to the CPU count')
+    parser.add_argument('--unordered', action='store_true', help='handle mazes as they complete')
+    parser.add_argument('--output', default='mazes.bin', help='raw wall bytes, one record per maze')
+    args = parser.parse_args(argv)
+
+    generator_class = getattr(maze_generators, args.generator)
+    jobs = make_jobs(generator_class, tuple(args.size), args.count, args.seed)
+    write_bulk(args.output, jobs, workers=args.workers, ordered=not args.unordered)
+    print(f'{args.count} mazes written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
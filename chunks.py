@@ -0,0 +1,99 @@
+import random
+from collections import OrderedDict
+
+import numpy as np
+
+from maze_generators import RandomizedDFS, maze_filler
+from tools import Maze, TOP, RIGHT, BOTTOM, LEFT, ALL_BORDERS, create_empty_maze
+
+
+class ChunkedMaze:
+    """Unbounded maze made of chunk_size chunks, generated on demand. Chunk (i, j) covers cells
+    [i * cols, (i + 1) * cols) x [j * rows, (j + 1) * rows) and is carved by generator_class with an rng seeded
+    from the world seed and (i, j), so it comes out the same whenever it is rebuilt.
+    Each chunk is a perfect maze, neighbouring chunks are joined by seam_passages openings per shared edge.
+    The openings are derived from the seed and the edge alone, so both chunks agree on them.
+    The latest cache_size chunks are kept in an LRU cache."""
+
+    def __init__(self, chunk_size: tuple = (32, 32), generator_class=RandomizedDFS, seed: int = 0,
+                 cache_size: int = 256, seam_passages: int = 1, **generator_options):
+        self.chunk_cols, self.chunk_rows = chunk_size
+        self.generator_class = generator_class
+        self.generator_options = generator_options
+        self.seed = seed
+        self.seam_passages = seam_passages
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.hits = self.misses = 0
+
+    def chunk_rng(self, *key) -> random.Random:
+        # String seeds are hashed with SHA-512, stable across runs unlike hash() of a tuple
+        return random.Random(':'.join(str(part) for part in (self.seed,) + key))
+
+    def seam(self, i: int, j: int, side: str) -> list:
+        """Opened offsets along the right or bottom edge of chunk (i, j)"""
+        length = self.chunk_cols if side == 'right' else self.chunk_rows
+        return self.chunk_rng(side, i, j).sample(range(length), min(self.seam_passages, length))
+
+    def build_chunk(self, i: int, j: int) -> Maze:
+        size = (self.chunk_cols, self.chunk_rows)
+        maze = create_empty_maze(*size)
+        generator = self.generator_class(size, rng=self.chunk_rng('chunk', i, j), **self.generator_options)
+        maze_filler(maze, generator)
+
+        walls = maze.walls
+        for y in self.seam(i, j, 'right'):
+            walls[y, -1] &= ALL_BORDERS ^ RIGHT
+        for y in self.seam(i, j - 1, 'right'):
+            walls[y, 0] &= ALL_BORDERS ^ LEFT
+        for x in self.seam(i, j, 'bottom'):
+            walls[-1, x] &= ALL_BORDERS ^ BOTTOM
+        for x in self.seam(i - 1, j, 'bottom'):
+            walls[0, x] &= ALL_BORDERS ^ TOP
+        walls.flags.writeable = False  # Shared through the cache
+        return maze
+
+    def chunk(self, i: int, j: int) -> Maze:
+        key = (i, j)
+        maze = self.cache.get(key)
+        if maze is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return maze
+
+        self.misses += 1
+        maze = self.cache[key] = self.build_chunk(i, j)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return maze
+
+    def cell_walls(self, y: int, x: int) -> int:
+        i, y = divmod(y, self.chunk_cols)
+        j, x = divmod(x, self.chunk_rows)
+        return int(self.chunk(i, j).walls[y, x])
+
+    def region(self, y_start: int, x_start: int, cols: int, rows: int) -> Maze:
+        """Copy of the cols x rows window whose top left cell is (y_start, x_start), coordinates may be negative"""
+        walls = np.empty((cols, rows), dtype=np.uint8)
+        y_stop, x_stop = y_start + cols, x_start + rows
+        for i in range(y_start // self.chunk_cols, (y_stop - 1) // self.chunk_cols + 1):
+            top = i * self.chunk_cols
+            chunk_y_start, chunk_y_stop = max(y_start, top), min(y_stop, top + self.chunk_cols)
+            for j in range(x_start // self.chunk_rows, (x_stop - 1) // self.chunk_rows + 1):
+                left = j * self.chunk_rows
+                chunk_x_start, chunk_x_stop = max(x_start, left), min(x_stop, left + self.chunk_rows)
+                walls[chunk_y_start - y_start:chunk_y_stop - y_start, chunk_x_start - x_start:chunk_x_stop - x_start] \
+                    = self.chunk(i, j).walls[chunk_y_start - top:chunk_y_stop - top,
+                                             chunk_x_start - left:chunk_x_stop - left]
+        return Maze(cols, rows, walls)
+
+
+if __name__ == '__main__':
+    from time import perf_counter
+
+    world = ChunkedMaze((32, 32), seed=7, cache_size=64)
+    start = perf_counter()
+    for step in range(200):  # Pan a 64x96 window diagonally across the world
+        world.region(step * 8, step * 5, 64, 96)
+    print(f'{perf_counter() - start:.3f} s, {world.misses} chunks built, {world.hits} cache hits, '
+          f'{len(world.cache)} cached')
@@ -1,7 +1,10 @@
+from functools import lru_cache
+
 import pygame
+from tools import Maze, TOP, RIGHT, BOTTOM, LEFT
 
 
-def draw_cell(surface: pygame.Surface, coord: tuple, cell, size: int, color: tuple, border_size: int,
+def draw_cell(surface: pygame.Surface, coord: tuple, walls: int, size: int, color: tuple, border_size: int,
               offsets: tuple = (0, 0),
               border_color: tuple = (0, 0, 0)):
 
@@ -12,32 +15,121 @@ def draw_cell(surface: pygame.Surface, coord: tuple, cell, size: int, color: tup
     rect_top = y * size + y_offset
     rect = pygame.Rect(rect_left, rect_top, size, size)
 
-    borders = cell.__dict__
-
     top_left = (rect_left, rect_top)
     top_right = (rect_left + size, rect_top)
     bottom_left = (rect_left, rect_top + size)
     bottom_right = (rect_left + size, rect_top + size)
 
     pygame.draw.rect(surface, color, rect)
-    if borders['top']:
+    if walls & TOP:
         pygame.draw.line(surface, border_color, top_left, top_right, border_size)
-    if borders['right']:
+    if walls & RIGHT:
         pygame.draw.line(surface, border_color, top_right, bottom_right, border_size)
-    if borders['bottom']:
+    if walls & BOTTOM:
         pygame.draw.line(surface, border_color, bottom_left, bottom_right, border_size)
-    if borders['left']:
+    if walls & LEFT:
         pygame.draw.line(surface, border_color, top_left, bottom_left, border_size)
 
 
-def draw_board(surface: pygame.Surface, board: list[list], size: int, color: tuple, border_size: int,
+class TileAtlas:
+    """A cell's look depends only on its 4-bit wall mask and fill colour, so every colour gets one
+    surface holding the 16 wall combinations side by side and boards are drawn with a single blits() call.
+    Tiles are clipped to their own cell, both cells sharing a wall draw their half of the line."""
+
+    def __init__(self, cell_size: int, border_size: int, border_color: tuple = (0, 0, 0)):
+        self.cell_size = cell_size
+        self.border_size = border_size
+        self.border_color = border_color
+        self.areas = [pygame.Rect(mask * cell_size, 0, cell_size, cell_size) for mask in range(16)]
+        self.surfaces = {}
+        self.destinations = {}
+
+    def surface(self, color) -> pygame.Surface:
+        color = tuple(color)
+        atlas = self.surfaces.get(color)
+        if atlas is None:
+            atlas = pygame.Surface((16 * self.cell_size, self.cell_size))
+            for mask, area in enumerate(self.areas):
+                atlas.set_clip(area)
+                draw_cell(atlas, (0, mask), mask, self.cell_size, color, self.border_size,
+                          border_color=self.border_color)
+            atlas.set_clip(None)
+            if pygame.display.get_surface() is not None:
+                atlas = atlas.convert()
+            self.surfaces[color] = atlas
+        return atlas
+
+    def cell_destination(self, pos: tuple, offsets: tuple = (0, 0)) -> tuple:
+        y, x = pos
+        y_offset, x_offset = offsets
+        return x * self.cell_size + x_offset, y * self.cell_size + y_offset
+
+    def board_destinations(self, cols: int, rows: int, offsets: tuple = (0, 0)) -> list:
+        key = (cols, rows, offsets)
+        if key not in self.destinations:
+            self.destinations[key] = [self.cell_destination((y, x), offsets) for y in range(cols) for x in range(rows)]
+        return self.destinations[key]
+
+    def blit_cell(self, surface: pygame.Surface, pos: tuple, walls: int, color, offsets: tuple = (0, 0)):
+        surface.blit(self.surface(color), self.cell_destination(pos, offsets), self.areas[walls])
+
+    def blit_cells(self, surface: pygame.Surface, cells, color_of, offsets: tuple = (0, 0)):
+        """Blit (pos, walls) pairs in one call, color_of maps a position to its fill colour"""
+        areas = self.areas
+        surface.blits([(self.surface(color_of(pos)), self.cell_destination(pos, offsets), areas[walls])
+                       for pos, walls in cells], doreturn=False)
+
+    def blit_board(self, surface: pygame.Surface, walls, color, offsets: tuple = (0, 0)):
+        atlas = self.surface(color)
+        areas = self.areas
+        cols, rows = walls.shape
+        destinations = self.board_destinations(cols, rows, offsets)
+        surface.blits([(atlas, destination, areas[mask])
+                       for destination, mask in zip(destinations, walls.ravel().tolist())], doreturn=False)
+
+
+@lru_cache(maxsize=32)
+def get_atlas(cell_size: int, border_size: int, border_color: tuple = (0, 0, 0)) -> TileAtlas:
+    return TileAtlas(cell_size, border_size, border_color)
+
+
+def draw_board(surface: pygame.Surface, board: Maze, size: int, color: tuple, border_size: int,
                offsets: tuple = (0, 0),
                border_color: tuple = (0, 0, 0)):
-    for y, row in enumerate(board):
-        for x, cell in enumerate(row):
-            coord = (y, x)
-            draw_cell(surface, coord, cell, size, color, border_size, offsets=offsets,
-                      border_color=border_color)
+    atlas = get_atlas(size, border_size, tuple(border_color))
+    atlas.blit_board(surface, board.walls, color, offsets=tuple(offsets))
+
+
+class DirtyRenderer:
+    """Keeps the board on a persistent surface and redraws only the cells marked since the last frame,
+    blitting their tiles from a TileAtlas in one call."""
+
+    def __init__(self, size: tuple, maze: Maze, cell_size: int, border_size: int, background_color: tuple,
+                 offsets: tuple = (0, 0), border_color: tuple = (0, 0, 0)):
+        self.maze = maze
+        self.offsets = offsets
+        self.atlas = get_atlas(cell_size, border_size, tuple(border_color))
+        self.board = pygame.Surface(size)
+        self.board.fill(background_color)
+        self.colors = {}
+        self.dirty = set()
+
+    def mark(self, pos: tuple, color: tuple):
+        self.colors[pos] = color
+        self.dirty.add(pos)
+
+    def redraw_dirty(self):
+        walls = self.maze.walls
+        cells = [(pos, int(walls[pos])) for pos in self.dirty]
+        self.atlas.blit_cells(self.board, cells, self.colors.__getitem__, self.offsets)
+        self.dirty.clear()
+
+    def render(self, surface: pygame.Surface, highlight: tuple = None, highlight_color: tuple = None):
+        """Bring the board up to date, blit it once and draw the highlighted cell on top"""
+        self.redraw_dirty()
+        surface.blit(self.board, (0, 0))
+        if highlight is not None:
+            self.atlas.blit_cell(surface, highlight, int(self.maze.walls[highlight]), highlight_color, self.offsets)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,170 @@
+import argparse
+import random
+import struct
+import zlib
+
+import numpy as np
+
+from tools import TOP, RIGHT, BOTTOM, LEFT
+
+DEFAULT_PALETTE = {
+    'cell': (200, 200, 200),
+    'visited': (150, 100, 100),
+    'path': (50, 150, 50),
+    'wall': (0, 0, 0),
+}
+
+
+def sorted_ids(cells) -> np.ndarray:
+    if cells is None:
+        return np.empty(0, dtype=np.int64)
+    return np.unique(np.fromiter(cells, dtype=np.int64))
+
+
+def image_size(maze, cell_size: int, border_size: int) -> tuple:
+    """Width and height in pixels, walls are border_size thick lines on the cell grid"""
+    cols, rows = maze.size
+    return rows * cell_size + border_size, cols * cell_size + border_size
+
+
+def paint_cells(walls: np.ndarray, kinds: np.ndarray, colors: np.ndarray, wall_color, cell_size: int,
+                border_size: int, above: np.ndarray = None, closed: bool = True) -> np.ndarray:
+    """Paint a block of cells into a (height, width, 3) uint8 array, cell (y, x) of the block at pixel
+    (y * cell_size, x * cell_size). kinds indexes colors per cell; above is the wall row over the block
+    and closed adds the line under its last row, so stacked blocks line up into one image."""
+    block_cols, block_rows = walls.shape
+    height = block_cols * cell_size + (border_size if closed else 0)
+    width = block_rows * cell_size + border_size
+
+    horizontal = np.zeros((block_cols + 1, block_rows), dtype=bool)
+    horizontal[:-1] |= (walls & TOP) != 0
+    horizontal[1:] |= (walls & BOTTOM) != 0
+    if above is not None:
+        horizontal[0] |= (above & BOTTOM) != 0
+    vertical = np.zeros((block_cols, block_rows + 1), dtype=bool)
+    vertical[:, :-1] |= (walls & LEFT) != 0
+    vertical[:, 1:] |= (walls & RIGHT) != 0
+
+    line_y = np.arange(height) // cell_size
+    line_x = np.arange(width) // cell_size
+    on_horizontal = (np.arange(height) % cell_size < border_size)[:, None]
+    on_vertical = (np.arange(width) % cell_size < border_size)[None, :]
+    cell_y = np.minimum(line_y, block_cols - 1)
+    cell_x = np.minimum(line_x, block_rows - 1)
+
+    wall = on_horizontal & on_vertical
+    wall |= on_horizontal & horizontal[line_y][:, cell_x]
+    wall |= on_vertical & vertical[cell_y][:, line_x]
+
+    image = colors[kinds[cell_y][:, cell_x]]
+    image[wall] = wall_color
+    return image
+
+
+def rasterize_band(maze, y_start: int, y_stop: int, cell_size: int = 4, border_size: int = 1,
+                   palette: dict = None, visited: np.ndarray = None, path: np.ndarray = None) -> np.ndarray:
+    """RGB pixels of cell rows [y_start, y_stop) as a (height, width, 3) uint8 array.
+    visited and path are sorted arrays of cell ids (y * rows + x) painted over the cell colour."""
+    palette = palette or DEFAULT_PALETTE
+    cols, rows = maze.size
+    walls = np.asarray(maze.walls[y_start:y_stop])
+    above = np.asarray(maze.walls[y_start - 1]) if y_start > 0 else None
+
+    kinds = np.zeros(walls.shape, dtype=np.uint8)
+    first_id, stop_id = y_start * rows, y_stop * rows
+    for kind, cells in ((1, visited), (2, path)):
+        if cells is not None and len(cells):
+            start, stop = np.searchsorted(cells, (first_id, stop_id))
+            kinds.ravel()[cells[start:stop] - first_id] = kind
+
+    colors = np.array([palette['cell'], palette['visited'], palette['path']], dtype=np.uint8)
+    return paint_cells(walls, kinds, colors, palette['wall'], cell_size, border_size, above=above,
+                       closed=y_stop == cols)
+
+
+def iter_bands(maze, cell_size: int = 4, border_size: int = 1, band_rows: int = 64, palette: dict = None,
+               visited=None, path=None):
+    """Rasterize the maze band by band so only band_rows cell rows of pixels exist at a time"""
+    visited, path = sorted_ids(visited), sorted_ids(path)
+    cols = maze.size[0]
+    for y_start in range(0, cols, band_rows):
+        y_stop = min(y_start + band_rows, cols)
+        yield rasterize_band(maze, y_start, y_stop, cell_size, border_size, palette, visited, path)
+
+
+def rasterize(maze, cell_size: int = 4, border_size: int = 1, palette: dict = None, visited=None, path=None):
+    return np.concatenate(list(iter_bands(maze, cell_size, border_size, palette=palette,
+                                          visited=visited, path=path)))
+
+
+def write_ppm(file_path, maze, cell_size: int = 4, border_size: int = 1, band_rows: int = 64, **overlays):
+    width, height = image_size(maze, cell_size, border_size)
+    with open(file_path, 'wb') as file:
+        file.write(b'P6\n%d %d\n255\n' % (width, height))
+        for band in iter_bands(maze, cell_size, border_size, band_rows, **overlays):
+            file.write(band.tobytes())
+
+
+def png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    checksum = zlib.crc32(data, zlib.crc32(chunk_type))
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', checksum)
+
+
+def write_png(file_path, maze, cell_size: int = 4, border_size: int = 1, band_rows: int = 64,
+              compression: int = 6, **overlays):
+    """8-bit RGB PNG, each band is compressed and written as IDAT data as soon as it is rasterized"""
+    width, height = image_size(maze, cell_size, border_size)
+    compressor = zlib.compressobj(compression)
+    with open(file_path, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n')
+        file.write(png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        for band in iter_bands(maze, cell_size, border_size, band_rows, **overlays):
+            scanlines = np.zeros((band.shape[0], width * 3 + 1), dtype=np.uint8)
+            scanlines[:, 1:] = band.reshape(band.shape[0], -1)
+            data = compressor.compress(scanlines.tobytes())
+            if data:
+                file.write(png_chunk(b'IDAT', data))
+        file.write(png_chunk(b'IDAT', compressor.flush()))
+        file.write(png_chunk(b'IEND', b''))
+
+
+def export_image(file_path, maze, **options):
+    if str(file_path).lower().endswith('.ppm'):
+        write_ppm(file_path, maze, **options)
+    else:
+        write_png(file_path, maze, **options)
+
+
+def main(argv=None):
+    import maze_generators
+    import maze_solvers
+    from maze_generators import maze_filler
+    from tools import create_empty_maze
+
+    parser = argparse.ArgumentParser(description='Generate a maze and write it as a PNG or PPM image')
+    parser.add_argument('output', help='.png or .ppm file')
+    parser.add_argument('--size', type=int, nargs=2, default=(100, 100), metavar=('COLS', 'ROWS'))
+    parser.add_argument('--generator', default='RandomizedDFS')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--solver', help='overlay the visited cells and path of this solver')
+    parser.add_argument('--cell-size', type=int, default=4)
+    parser.add_argument('--border-size', type=int, default=1)
+    parser.add_argument('--band-rows', type=int, default=64, help='cell rows rasterized at a time')
+    args = parser.parse_args(argv)
+
+    size = tuple(args.size)
+    maze = create_empty_maze(*size)
+    maze_filler(maze, getattr(maze_generators, args.generator)(size, rng=random.Random(args.seed)))
+
+    overlays = {}
+    if args.solver:
+        solver = getattr(maze_solvers, args.solver)(maze)
+        overlays['path'] = solver.solve()
+        overlays['visited'] = solver.visited_ids()
+
+    export_image(args.output, maze, cell_size=args.cell_size, border_size=args.border_size,
+                 band_rows=args.band_rows, **overlays)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+from collections import defaultdict, deque, namedtuple
+from time import perf_counter
+
+StepSample = namedtuple('StepSample', ['step', 'phase', 'frontier', 'scan', 'duration', 'revisit'])
+
+
+class Recorder:
+    """Per-step counters and timings for one instrumented generator or solver.
+    The latest samples are kept in a ring buffer of `capacity` entries, callback (if any) gets every sample."""
+
+    def __init__(self, capacity: int = 10000, callback=None):
+        self.samples = deque(maxlen=capacity)
+        self.callback = callback
+        self.steps = 0
+        self.revisits = 0
+        self.max_frontier = 0
+        self.max_scan = 0
+        self.phase_steps = defaultdict(int)
+        self.phase_time = defaultdict(float)
+
+    def record(self, phase: str, frontier: int, scan: int, duration: float, revisit: bool):
+        self.steps += 1
+        self.phase_steps[phase] += 1
+        self.phase_time[phase] += duration
+        if revisit:
+            self.revisits += 1
+        if frontier > self.max_frontier:
+            self.max_frontier = frontier
+        if scan > self.max_scan:
+            self.max_scan = scan
+
+        sample = StepSample(self.steps, phase, frontier, scan, duration, revisit)
+        self.samples.append(sample)
+        if self.callback:
+            self.callback(sample)
+
+    def timed(self, function, phase: str):
+        """Wrap a function so its run time is added to `phase` without counting as a step"""
+        def timed_function(*args):
+            start = perf_counter()
+            result = function(*args)
+            self.phase_time[phase] += perf_counter() - start
+            return result
+
+        return timed_function
+
+    def summary(self) -> dict:
+        return {
+            'steps': self.steps,
+            'revisits': self.revisits,
+            'max_frontier': self.max_frontier,
+            'max_scan': self.max_scan,
+            'phases': {phase: {'steps': self.phase_steps.get(phase, 0), 'time': time}
+                       for phase, time in self.phase_time.items()},
+        }
+
+    def report(self) -> str:
+        lines = [f'steps: {self.steps}, revisits: {self.revisits}, '
+                 f'max frontier: {self.max_frontier}, max scan: {self.max_scan}']
+        for phase, time in sorted(self.phase_time.items(), key=lambda item: -item[1]):
+            steps = self.phase_steps.get(phase, 0)
+            per_step = f'{time / steps * 1e6:10.2f} us/step' if steps else ''
+            lines.append(f'  {phase:<8} {steps:>10} steps {time:10.4f} s {per_step}')
+        return '\n'.join(lines)
+
+
+def instrument(algorithm, recorder: Recorder):
+    """Shadow algorithm.move with a recording wrapper, the class itself is untouched so
+    uninstrumented objects pay nothing. Phase comes from algorithm.phase, frontier size from
+    algorithm.frontier_size() and hunt scan length from algorithm.scan_length when they exist.
+    A step that leaves algorithm.visited_count unchanged counts as a revisit."""
+    move = getattr(type(algorithm), 'move').__get__(algorithm)
+    frontier_size = getattr(algorithm, 'frontier_size', lambda: 0)
+
+    def instrumented_move():
+        visited_before = algorithm.visited_count
+        start = perf_counter()
+        result = move()
+        duration = perf_counter() - start
+        recorder.record(getattr(algorithm, 'phase', 'move'), frontier_size(), getattr(algorithm, 'scan_length', 0),
+                        duration, algorithm.visited_count == visited_before)
+        return result
+
+    algorithm.move = instrumented_move
+    return algorithm
+
+
+def uninstrument(algorithm):
+    algorithm.__dict__.pop('move', None)
+    return algorithm
+
+
+if __name__ == '__main__':
+    from maze_generators import HuntAndKill, maze_filler
+    from maze_solvers import BFS
+    from tools import create_empty_maze
+
+    maze = create_empty_maze(100, 100)
+    generator_recorder = Recorder()
+    maze_filler(maze, HuntAndKill((100, 100)), recorder=generator_recorder)
+    print('HuntAndKill')
+    print(generator_recorder.report())
+
+    solver_recorder = Recorder()
+    solver = instrument(BFS(maze), solver_recorder)
+    solver.solve()
+    print('BFS')
+    print(solver_recorder.report())
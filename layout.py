@@ -1,6 +1,17 @@
+import os
+import tempfile
+import tkinter as tk
+from functools import partial
+
+import numpy as np
 import PySimpleGUI as sg
+from export import paint_cells
 from maze_generators import maze_filler
-from tools import get_direction, reverse_tuple, directions, remove_border, create_empty_maze
+from maze_file import save_maze
+from maze_graph import compile_maze
+from race import SolverRace
+from tools import ALL_BORDERS, BOTTOM, LEFT, RIGHT, TOP, border_bits, create_empty_maze
+from worker import AlgorithmWorker, StepScheduler
 
 
 class CanvasCell:
@@ -33,12 +44,11 @@ class CanvasCell:
 
         return pos, cell, borders
 
-    def update_borders(self, cell):
+    def update_borders(self, walls: int):
         self.canvas.send_figure_to_back(self.rectangle)
-        cell_borders = cell.__dict__
-        for border_name, visibility in cell_borders.items():
+        for border_name, bit in border_bits.items():
             line = self.borders[border_name]
-            if visibility:
+            if walls & bit:
                 self.canvas.bring_figure_to_front(line)
             else:
                 self.canvas.delete_figure(line)
@@ -90,10 +100,10 @@ class DynamicCanvas:
     def draw_finished_maze(self, maze):
         self.clear()
         # self.change_cell_color((0, 0), self.highlighted_cell_color)
-        for y, row in enumerate(maze):
-            for x, cell in enumerate(row):
+        for y, row in enumerate(maze.walls.tolist()):
+            for x, walls in enumerate(row):
                 pos = (y, x)
-                self.draw_cell(pos, cell, self.cell_color)
+                self.draw_cell(pos, walls, self.cell_color)
 
     def draw_highlighted_cell(self, pos, erase_previous=True):
         if self.highlighted_cell and erase_previous:
@@ -108,32 +118,174 @@ class DynamicCanvas:
                                                            line_color=self.highlighted_cell_color,
                                                            line_width=self.border_size)
 
-    def draw_cell(self, pos: tuple, cell, color):
+    def draw_cell(self, pos: tuple, walls: int, color):
         if pos not in self.canvas_objects:
             canvas_rectangle = CanvasCell(self.canvas, pos, self.cell_size, self.border_size, color,
                                           self.border_color)
             self.canvas_objects[pos] = canvas_rectangle
 
         canvas_rectangle = self.canvas_objects[pos]
-        canvas_rectangle.update_borders(cell)
+        canvas_rectangle.update_borders(walls)
 
     def change_cell_color(self, pos, new_color):
         cell = self.canvas_objects[pos]
         cell.change_color(new_color)
 
+    def flush(self):
+        """Figures are drawn immediately, nothing to push"""
+
+
+class ImageCanvas(DynamicCanvas):
+    """DynamicCanvas backed by a single Tk photo image instead of five figures per cell.
+    Cell updates only change the wall/colour arrays; flush() copies a cached tile per changed cell into a
+    persistent pixel buffer and pushes the bounding box of the changes to the image as raw PPM data,
+    one put call per frame without any compression."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wall_size = self.border_size + 1
+        self.color_names = [self.background_color]
+        self.rgb_colors = {}
+        self.walls = np.full((self.cols, self.rows), ALL_BORDERS, dtype=np.uint8)
+        self.kinds = np.zeros((self.cols, self.rows), dtype=np.uint8)
+        self.highlights = set()
+        self.highlighted_pos = None
+        self.dirty = set()
+        self.full_repaint = True
+        self.photo = None
+        self.pixels = None
+        self.tiles = {}
+
+    def clear(self):
+        super().clear()
+        self.photo = None
+        self.walls[:] = ALL_BORDERS
+        self.kinds[:] = 0
+        self.highlights.clear()
+        self.highlighted_pos = None
+        self.dirty.clear()
+        self.full_repaint = True
+
+    def color_index(self, color) -> int:
+        if color not in self.color_names:
+            self.color_names.append(color)
+        return self.color_names.index(color)
+
+    def rgb(self, color) -> tuple:
+        if color not in self.rgb_colors:
+            red, green, blue = self.canvas.TKCanvas.winfo_rgb(color)
+            self.rgb_colors[color] = (red >> 8, green >> 8, blue >> 8)
+        return self.rgb_colors[color]
+
+    def draw_finished_maze(self, maze):
+        self.clear()
+        self.walls[:] = maze.walls
+        self.kinds[:] = self.color_index(self.cell_color)
+
+    def draw_highlighted_cell(self, pos, erase_previous=True):
+        if self.highlighted_pos is not None and erase_previous:
+            self.highlights.discard(self.highlighted_pos)
+            self.dirty.add(self.highlighted_pos)
+        self.highlighted_pos = pos
+        self.highlights.add(pos)
+        self.dirty.add(pos)
+
+    def draw_cell(self, pos: tuple, walls: int, color):
+        if not self.kinds[pos]:
+            self.kinds[pos] = self.color_index(color)
+        self.walls[pos] = walls
+        self.dirty.add(pos)
+
+    def change_cell_color(self, pos, new_color):
+        self.kinds[pos] = self.color_index(new_color)
+        self.dirty.add(pos)
+
+    def create_photo(self):
+        width = self.rows * self.cell_size + self.wall_size
+        height = self.cols * self.cell_size + self.wall_size
+        self.photo = tk.PhotoImage(master=self.canvas.TKCanvas, width=width, height=height)
+        self.pixels = np.empty((height, width, 3), dtype=np.uint8)
+        offset = self.border_size - self.wall_size // 2  # Centre the wall lines on the graph grid
+        self.canvas.TKCanvas.create_image(offset, offset, image=self.photo, anchor='nw')
+
+    def tile(self, walls: int, kind: int, highlighted: bool) -> np.ndarray:
+        """Pixels of one cell and the wall lines around it, cached per walls, colour and highlight"""
+        key = (walls, kind, highlighted)
+        if key not in self.tiles:
+            colors = np.array([self.rgb(color) for color in self.color_names], dtype=np.uint8)
+            tile = paint_cells(np.array([[walls]], dtype=np.uint8), np.array([[kind]], dtype=np.uint8), colors,
+                               self.rgb(self.border_color), self.cell_size, self.wall_size)
+            if highlighted:
+                inset, end = self.wall_size + self.border_size, self.cell_size - self.border_size
+                tile[inset:end, inset:end] = self.rgb(self.highlighted_cell_color)
+            self.tiles[key] = tile
+        return self.tiles[key]
+
+    def paint_cell(self, y: int, x: int):
+        """Copy the tile of a cell into the pixel buffer. A cell owns its top and left wall lines, which also
+        show the walls its upper and left neighbours draw; the last row and column add the closing lines."""
+        walls = int(self.walls[y, x])
+        if y and self.walls[y - 1, x] & BOTTOM:
+            walls |= TOP
+        if x and self.walls[y, x - 1] & RIGHT:
+            walls |= LEFT
+        tile = self.tile(walls, int(self.kinds[y, x]), (y, x) in self.highlights)
+        size = self.cell_size
+        height = size + (self.wall_size if y == self.cols - 1 else 0)
+        width = size + (self.wall_size if x == self.rows - 1 else 0)
+        self.pixels[y * size:y * size + height, x * size:x * size + width] = tile[:height, :width]
+
+    def flush(self):
+        if self.photo is None:
+            self.create_photo()
+            self.full_repaint = True
+        if self.full_repaint:
+            y_start, y_stop, x_start, x_stop = 0, self.cols, 0, self.rows
+            colors = np.array([self.rgb(color) for color in self.color_names], dtype=np.uint8)
+            self.pixels[:] = paint_cells(self.walls, self.kinds, colors, self.rgb(self.border_color), self.cell_size,
+                                         self.wall_size)
+            for y, x in self.highlights:
+                self.paint_cell(y, x)
+        elif self.dirty:
+            # The lines a cell owns show the walls of its upper and left neighbours, so repaint below and right too
+            cells = set(self.dirty)
+            cells.update((y + 1, x) for y, x in self.dirty if y + 1 < self.cols)
+            cells.update((y, x + 1) for y, x in self.dirty if x + 1 < self.rows)
+            for y, x in cells:
+                self.paint_cell(y, x)
+            ys, xs = zip(*cells)
+            y_start, y_stop, x_start, x_stop = min(ys), max(ys) + 1, min(xs), max(xs) + 1
+        else:
+            return
+        self.full_repaint = False
+        self.dirty.clear()
+
+        size = self.cell_size
+        region = self.pixels[y_start * size:y_stop * size + self.wall_size,
+                             x_start * size:x_stop * size + self.wall_size]
+        data = b'P6\n%d %d\n255\n' % (region.shape[1], region.shape[0]) + region.tobytes()
+        self.photo.tk.call(self.photo.name, 'put', data, '-format', 'ppm', '-to', x_start * size, y_start * size)
+
 
 class DynamicLayout:
     def __init__(self, generators: list, solvers: list, cols, rows, cell_size,
-                 current_state='Generate'):
+                 current_state='Generate', image_canvas=False):
         self.window = None
 
         self.running = True
-        self.paused = True
-        self.speed = 1000
+        self.worker = None
+        self.race_mode = False
+        self.race = None
+        self.race_path = None
+        self.replay_step = 0
+        self.frame_time = 1 / 60
+        self.scheduler = StepScheduler(frame_budget=self.frame_time * 0.75)
+        self.rate_text = ''
         self.current_state = current_state
 
         self.cols, self.rows = cols, rows
         self.cell_size = cell_size
+        self.canvas_class = ImageCanvas if image_canvas else DynamicCanvas
 
         self.generators = generators
         self.solvers = solvers
@@ -157,7 +309,7 @@ class DynamicLayout:
 
         speed_plus_button = sg.Button('+', key='-FASTER-', size=(2, 2))
         speed_minus_button = sg.Button('-', key='-SLOWER-', size=(2, 2))
-        speed_text = sg.Button('Speed', size=(10, 2), mouseover_colors=('black', 'white'))
+        self.speed_text = sg.Button('Speed', size=(10, 2), mouseover_colors=('black', 'white'))
 
         self.control_panel = sg.Column([
             [sg.Text('')],
@@ -165,11 +317,12 @@ class DynamicLayout:
             [sg.Text('')],
             [sg.Push(), start_pause_button, refresh_button, sg.Push()],
             [sg.Text('')],
-            [sg.Push(), speed_plus_button, speed_text, speed_minus_button, sg.Push()],
+            [sg.Push(), speed_plus_button, self.speed_text, speed_minus_button, sg.Push()],
             [sg.Text('')],
             [sg.HSeparator()],
             [sg.Text('')],
-            [sg.Text('Maze for solving: '), self.choice_box]
+            [sg.Text('Maze for solving: '), self.choice_box],
+            [sg.Checkbox('Race solvers in separate processes', key='-RACE-', enable_events=True)]
         ], expand_y=True)
 
         self.layout = [self.grid, sg.VSeparator(), self.control_panel]
@@ -183,7 +336,7 @@ class DynamicLayout:
         canvas_objects = []
 
         for i in range(4):
-            canvas = DynamicCanvas(self.cols, self.rows, self.cell_size)
+            canvas = self.canvas_class(self.cols, self.rows, self.cell_size)
             canvas_objects.append(canvas)
             canvases.append(canvas.column)
 
@@ -192,73 +345,156 @@ class DynamicLayout:
 
         return grid, canvas_objects
 
+    @property
+    def paused(self) -> bool:
+        return self.worker is None or self.worker.paused
+
     def refresh(self):
-        if self.current_state == 'Generate':
+        """Restart the current view, algorithms are built and stepped on a fresh worker thread"""
+        paused = self.paused
+        if self.worker is not None:
+            self.worker.stop()
+
+        class_instances = self.generators if self.current_state == 'Generate' else self.solvers
+        # Bound now, the UI may switch current_state or race_mode before this worker is stopped
+        state = 'Race' if self.current_state == 'Solve' and self.race_mode else self.current_state
+        for class_instance, canvas in zip(class_instances, self.canvas_objects):
+            canvas.clear()
+            canvas.change_title(class_instance.__name__)
+        self.flush()
+
+        self.worker = AlgorithmWorker(partial(self.move, state), self.scheduler, setup=partial(self.setup, state),
+                                      teardown=self.teardown, frame_time=self.frame_time)
+        self.worker.start(paused=paused)
+
+    def setup(self, state, emit, stopped):
+        """Runs on the worker: the blocking solving maze generation happens here, not in the UI.
+        The maze is carved batch by batch so a stop from the UI is honoured between batches."""
+        canvas_count = len(self.canvas_objects)  # Algorithms past the last canvas are left out
+        if state == 'Generate':
             self.basic_maze = None
-            class_instances = self.generators
-            argument = (self.cols, self.rows)
-            self.mazes = [create_empty_maze(self.cols, self.rows) for _ in range(4)]
+            self.mazes = [create_empty_maze(self.cols, self.rows) for _ in range(canvas_count)]
+            self.algorithm_objects = [inst((self.cols, self.rows)) for inst in self.generators[:canvas_count]]
         else:
-            class_instances = self.solvers
             self.basic_maze = create_empty_maze(self.cols, self.rows)
-            maze_filler(self.basic_maze, self.basic_maze_generator((self.cols, self.rows)))
-            argument = self.basic_maze
-
-        class_objects = [inst(argument) for inst in class_instances]
-
-        for class_object, canvas in zip(class_objects, self.canvas_objects):
-            class_name = class_object.__class__.__name__
-            canvas.clear()
-            canvas.change_title(class_name)
-            if self.basic_maze:
-                canvas.draw_finished_maze(self.basic_maze)
-                canvas.change_cell_color((0, 0), '#58846d')
-
-        self.algorithm_objects = class_objects
-
-    def generator_move(self, algorithm, canvas, maze):
-        # maze_filler(maze, algorithm, step_by_step=True)
-        curr_pos = algorithm.move()
+            for events in self.basic_maze_generator((self.cols, self.rows)).iter_batches():
+                if stopped.is_set():
+                    return
+                self.basic_maze.carve_events(events)
+            emit(('maze', self.basic_maze))
+            if state == 'Race':
+                self.start_race()
+            else:
+                graph = compile_maze(self.basic_maze)
+                self.algorithm_objects = [inst(graph) for inst in self.solvers[:canvas_count]]
+
+    def start_race(self):
+        """Save the solving maze for the race processes to memory-map, then start them"""
+        file_descriptor, self.race_path = tempfile.mkstemp(suffix='.maze')
+        os.close(file_descriptor)
+        save_maze(self.race_path, self.basic_maze)
+        self.algorithm_objects = []
+        self.replay_step = 0
+        self.race = SolverRace(self.solvers[:len(self.canvas_objects)], self.race_path).start_processes()
+
+    def teardown(self):
+        if self.race is not None:
+            self.race.stop()
+            self.race = None
+        if self.race_path is not None:
+            os.remove(self.race_path)
+            self.race_path = None
+
+    def flush(self):
+        for canvas in self.canvas_objects:
+            canvas.flush()
+
+    def generator_move(self, algorithm, index, maze, emit):
+        maze_filler(maze, algorithm, step_by_step=True)
+        curr_pos = algorithm.curr
         prev_pos = algorithm.prev
 
         y, x = curr_pos
         prev_y, prev_x = prev_pos
+        emit(('cell', index, prev_pos, int(maze.walls[prev_y, prev_x])))
+        emit(('cell', index, curr_pos, int(maze.walls[y, x])))
+        emit(('highlight', index, curr_pos))
 
-        curr_cell = maze[y][x]
-        prev_cell = maze[prev_y][prev_x]
-
-        direction = get_direction(curr_pos, prev_pos)
-        reversed_direction = reverse_tuple(direction)
-
-        direction_name = directions[direction]
-        reversed_direction_name = directions[reversed_direction]
-
-        remove_border(curr_cell, direction_name)
-        remove_border(prev_cell, reversed_direction_name)
-
-        canvas.draw_cell(prev_pos, prev_cell, 'lightgray')
-        canvas.draw_cell(curr_pos, curr_cell, 'lightgray')
-
-        canvas.draw_highlighted_cell(curr_pos)
-
-    def solver_move(self, algorithm, canvas):
+    def solver_move(self, algorithm, index, emit):
         algorithm.move()
-        curr_pos = algorithm.curr
-        canvas.change_cell_color(curr_pos, canvas.highlighted_cell_color)
-
-    def move(self):
+        emit(('visit', index, algorithm.curr))
+
+    def race_move(self, emit) -> bool:
+        """Replay step replay_step of every race trace together, waiting for solvers still streaming it"""
+        race = self.race
+        race.poll()
+        lengths = race.trace_lengths
+        step = self.replay_step
+        if any(result is None and length <= step for result, length in zip(race.results, lengths)):
+            return True
+        for index, length in enumerate(lengths):
+            if step < length:
+                emit(('visit', index, divmod(int(race.trace(index)[step]), self.rows)))
+        self.replay_step += 1
+
+        if race.finished and self.replay_step >= max(lengths):
+            for index, result in enumerate(race.results):
+                if result['failed']:
+                    emit(('title', index, f"{result['solver']}: failed after {result['steps']} steps"))
+                else:
+                    emit(('title', index, f"{result['solver']}: {result['steps']} steps, "
+                                          f"{result['cpu_time'] * 1000:.0f} ms CPU"))
+            emit(('finished',))
+            return False
+        return True
+
+    def move(self, state, emit) -> bool:
+        """One step of every unfinished algorithm, runs on the worker thread"""
+        if state == 'Race':
+            return self.race_move(emit)
         if all(not alg.not_finished for alg in self.algorithm_objects):
-            self.paused = True
-            return
-        for algorithm, canvas, maze in zip(self.algorithm_objects, self.canvas_objects, self.mazes):
+            emit(('finished',))
+            return False
+        for index, algorithm in enumerate(self.algorithm_objects):
             if algorithm.not_finished:
-                if self.current_state == 'Generate':
-                    self.generator_move(algorithm, canvas, maze)
+                if state == 'Generate':
+                    self.generator_move(algorithm, index, self.mazes[index], emit)
                 else:
-                    self.solver_move(algorithm, canvas)
+                    self.solver_move(algorithm, index, emit)
+        return True
+
+    def apply_events(self):
+        """Draw everything the worker queued since the last frame"""
+        canvases = self.canvas_objects
+        for event in self.worker.drain():
+            kind = event[0]
+            if kind == 'cell':
+                _, index, pos, walls = event
+                canvases[index].draw_cell(pos, walls, 'lightgray')
+            elif kind == 'highlight':
+                canvases[event[1]].draw_highlighted_cell(event[2])
+            elif kind == 'visit':
+                canvas = canvases[event[1]]
+                canvas.change_cell_color(event[2], canvas.highlighted_cell_color)
+            elif kind == 'maze':
+                for canvas in canvases:
+                    canvas.draw_finished_maze(event[1])
+                    canvas.change_cell_color((0, 0), '#58846d')
+            elif kind == 'title':
+                canvases[event[1]].change_title(event[2])
+            elif kind == 'finished':
+                self.worker.pause()
+
+    def show_rate(self):
+        target = self.scheduler.steps_per_second
+        target_text = 'max' if target is None else f'{target:g}'
+        rate_text = f'{self.scheduler.step_rate:,.0f} / {target_text}'
+        if rate_text != self.rate_text:
+            self.rate_text = rate_text
+            self.speed_text.update(rate_text)
 
     def event_handler(self):
-        event, values = self.window.read(timeout=self.speed)
+        event, values = self.window.read(timeout=int(self.frame_time * 1000))
         if event == sg.WIN_CLOSED:
             self.running = False
             return
@@ -269,40 +505,35 @@ class DynamicLayout:
             disable = False if event == 'Solve' else True
             self.choice_box.update(disabled=disable)
         elif event == '-REFRESH-':
-            self.paused = True
+            self.worker.pause()
             self.refresh()
         elif event == '-STARTPAUSE-':
-            self.paused = not self.paused
+            if self.worker.paused:
+                self.worker.resume()
+            else:
+                self.worker.pause()
         elif event == '-FASTER-':
-            self.speed //= 2
-            print(self.speed)
+            self.scheduler.faster()
         elif event == '-SLOWER-':
-            if self.speed < 2:
-                self.speed += 1
-            else:
-                self.speed *= 2
-            print(self.speed)
+            self.scheduler.slower()
+        elif event == '-RACE-':
+            self.race_mode = values[event]
+            if self.current_state == 'Solve':
+                self.refresh()
         elif event == '-GENERATOR_CHOICE-':
             name = values[event]
             self.basic_maze_generator = self.generator_names_map[name]
             self.refresh()
-        if not self.paused:
-            self.move()
-
-
-if __name__ == '__main__':
-    from maze_generators import RandomizedDFS, RandomizedPrim, HuntAndKill, PlaceholderGenerator
-    from maze_solvers import DFS, BFS, PriorityDFS, PlaceholderSolver
+        self.apply_events()
+        self.flush()
+        self.show_rate()
 
-    generator_classes = [RandomizedDFS, RandomizedPrim, HuntAndKill, PlaceholderGenerator]
-    solver_classes = [DFS, BFS, PriorityDFS, PlaceholderSolver]
-
-    col_len = row_len = 40
-    size = 10
 
+def run(generator_classes: list, solver_classes: list, size: tuple = (40, 40), cell_size: int = 10):
+    """Open the side-by-side generator and solver window until it is closed"""
     sg.theme('DarkTeal6')
 
-    LayoutController = DynamicLayout(generator_classes, solver_classes, col_len, row_len, size)
+    LayoutController = DynamicLayout(generator_classes, solver_classes, *size, cell_size, image_canvas=True)
 
     window = sg.Window('Window Title', [LayoutController.layout], finalize=True, return_keyboard_events=True)
 
@@ -310,4 +541,12 @@ if __name__ == '__main__':
 
     while LayoutController.running:
         LayoutController.event_handler()
+    LayoutController.worker.stop()
     window.close()
+
+
+if __name__ == '__main__':
+    from maze_generators import RandomizedDFS, RandomizedPrim, HuntAndKill, RandomizedKruskal
+    from maze_solvers import DFS, BFS, PriorityDFS, AStar
+
+    run([RandomizedDFS, RandomizedPrim, HuntAndKill, RandomizedKruskal], [DFS, BFS, PriorityDFS, AStar])
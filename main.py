@@ -1,19 +1,9 @@
 import pygame
-from maze_generators import RandomizedDFS, RandomizedPrim,HuntAndKill, maze_filler
+from maze_generators import RandomizedDFS, RandomizedPrim, HuntAndKill, RandomizedKruskal, maze_filler
 from maze_solvers import DFS
-from drawing_tools import draw_cell
+from drawing_tools import DirtyRenderer
 from tools import create_empty_maze
-
-pygame.init()
-clock = pygame.time.Clock()
-speed = 30
-
-cols = rows = 15
-cell_size = 30
-border_size = cell_size // 10 if cell_size // 10 >= 1 else 1
-
-surface = pygame.display.set_mode((cell_size * rows, cell_size * cols))
-pygame.display.set_caption('Maze algorithms')
+from worker import AlgorithmWorker, StepScheduler
 
 black = (0, 0, 0)
 background_color = (150, 150, 150)
@@ -22,58 +12,80 @@ visited_cell_color = (150, 100, 100)
 
 generator_cell_color = (50, 150, 50)
 
-maze = create_empty_maze(cols, rows)
-
-# generator = RandomizedDFS((cols, rows))
-generator = HuntAndKill((cols, rows))
-# generator = RandomizedPrim((cols, rows))
-solver = None
 
-running = True
-paused = True
-
-while running:
-    surface.fill(background_color)
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE:
-                paused = not paused
-            elif event.key == pygame.K_ESCAPE:
+def run(generator_class=HuntAndKill, solver_class=DFS, size: tuple = (15, 15), cell_size: int = 30,
+        speed: int = 30, **generator_options):
+    """Animate generating a maze, then solving it, in a pygame window until it is closed"""
+    pygame.init()
+    clock = pygame.time.Clock()
+
+    cols, rows = size
+    border_size = cell_size // 10 if cell_size // 10 >= 1 else 1
+
+    surface = pygame.display.set_mode((cell_size * rows, cell_size * cols))
+    pygame.display.set_caption('Maze algorithms')
+
+    maze = create_empty_maze(cols, rows)
+    generator = generator_class((cols, rows), **generator_options)
+    solver = None
+
+    running = True
+    front = (generator.curr, generator_cell_color)
+
+    def step(emit):
+        """Runs on the worker thread: generate, then solve the finished maze"""
+        nonlocal solver
+        if generator.not_finished:
+            maze_filler(maze, generator, step_by_step=True)
+            if generator.carved:  # Only cells touched by this step need redrawing
+                emit(('mark', generator.prev, cell_color))
+                emit(('mark', generator.curr, cell_color))
+            emit(('front', generator.curr, generator_cell_color))
+            return True
+
+        if solver is None:
+            solver = solver_class(maze)
+            emit(('mark', solver.curr, visited_cell_color))
+        elif solver.not_finished:
+            solver.move()
+            emit(('mark', solver.curr, visited_cell_color))
+        emit(('front', solver.curr, visited_cell_color))
+        return solver.not_finished
+
+    renderer = DirtyRenderer(surface.get_size(), maze, cell_size, border_size, background_color)
+    renderer.mark(generator.curr, cell_color)
+    worker = AlgorithmWorker(step, StepScheduler(steps_per_second=speed), frame_time=1 / speed).start()
+
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
                 running = False
-
-    maze_filler(maze, generator, step_by_step=True, paused=paused)
-    # print(generator.curr, generator.prev)
-
-    if generator.not_finished == False and solver == None:
-        solver = DFS(maze)
-
-    if solver and solver.not_finished and not paused:
-        solver.move()
-
-    for y, row in enumerate(maze):
-        for x, cell in enumerate(row):
-            pos = (y, x)
-            if solver:
-                if pos in solver.visited:
-                    color = visited_cell_color
-                else:
-                    color = cell_color
-                draw_cell(surface, pos, cell, cell_size, color, border_size=border_size)
-            elif pos in generator.visited:  # Draw cell only if it was already visited
-                draw_cell(surface, pos, cell, cell_size, cell_color, border_size=border_size)
-    if generator.not_finished:
-        pos = generator.curr
-        front_cell_color = generator_cell_color
-    if solver:
-        pos = solver.curr
-        front_cell_color = visited_cell_color
-
-    y, x = pos
-    cell = maze[y][x]
-    draw_cell(surface, pos, cell, cell_size, front_cell_color, border_size)  # Highlight current cell
-
-    clock.tick(speed)
-    pygame.display.flip()
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    if worker.paused:
+                        worker.resume()
+                    else:
+                        worker.pause()
+                elif event.key == pygame.K_ESCAPE:
+                    running = False
+
+        for kind, pos, color in worker.drain():
+            if kind == 'mark':
+                renderer.mark(pos, color)
+            else:
+                front = (pos, color)
+
+        renderer.render(surface, *front)  # Highlight current cell
+
+        clock.tick(speed)
+        pygame.display.flip()
+
+    worker.stop()
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    # run(RandomizedDFS)
+    run(HuntAndKill, show_scan=True)
+    # run(RandomizedPrim)
+    # run(RandomizedKruskal)
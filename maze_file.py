@@ -0,0 +1,198 @@
+import struct
+
+import numpy as np
+
+from tools import Maze, TOP, RIGHT, BOTTOM, LEFT
+
+MAGIC = b'MAZE'
+VERSION = 1
+HAS_PATH = 1
+
+# magic, version, flags, cols, rows, path offset, path length
+HEADER = struct.Struct('<4sHHIIQQ')
+
+
+def row_bytes(rows: int) -> int:
+    """Bytes of one packed cell row: the left edge bit, then right and bottom bits of every cell"""
+    return (2 * rows + 1 + 7) // 8
+
+
+def pack_rows(walls: np.ndarray) -> np.ndarray:
+    """(k, row_bytes) uint8 records of a block of wall rows, each wall shared by two cells is stored once"""
+    block_cols, rows = walls.shape
+    bits = np.zeros((block_cols, 2 * rows + 1), dtype=bool)
+    bits[:, 0] = (walls[:, 0] & LEFT) != 0
+    bits[:, 1::2] = (walls & RIGHT) != 0
+    bits[:, 2::2] = (walls & BOTTOM) != 0
+    return np.packbits(bits, axis=1, bitorder='little')
+
+
+def pack_top(walls_row: np.ndarray) -> np.ndarray:
+    """Record of the top edge of the maze, padded to the size of a cell row record"""
+    record = np.zeros(row_bytes(len(walls_row)), dtype=np.uint8)
+    top = np.packbits((walls_row & TOP) != 0, bitorder='little')
+    record[:len(top)] = top
+    return record
+
+
+def unpack_rows(records: np.ndarray, above: np.ndarray, rows: int) -> np.ndarray:
+    """Wall bits of a block of packed rows, above is the bottom-wall row over the block as booleans"""
+    bits = np.unpackbits(records, axis=1, count=2 * rows + 1, bitorder='little').astype(bool)
+    right, bottom = bits[:, 1::2], bits[:, 2::2]
+    left = np.empty_like(right)
+    left[:, 0] = bits[:, 0]
+    left[:, 1:] = right[:, :-1]
+    top = np.empty_like(bottom)
+    top[:1] = above  # An empty block stays empty
+    top[1:] = bottom[:-1]
+
+    walls = np.zeros(right.shape, dtype=np.uint8)
+    walls[top] |= TOP
+    walls[right] |= RIGHT
+    walls[bottom] |= BOTTOM
+    walls[left] |= LEFT
+    return walls
+
+
+class MazeFileWriter:
+    """Appends cell rows to a maze file in order, the header is completed on close so the number of rows
+    need not be known up front. Only the rows of one write_rows call are held in memory."""
+
+    def __init__(self, file_path, rows: int):
+        self.rows = rows
+        self.cols = 0
+        self.file = open(file_path, 'wb')
+        self.file.write(bytes(HEADER.size))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+    def write_rows(self, walls: np.ndarray):
+        """Append a (k, rows) block of wall rows, or a single row"""
+        walls = np.atleast_2d(np.asarray(walls))
+        if walls.shape[1] != self.rows:
+            raise ValueError(f'Expected rows of {self.rows} cells, got {walls.shape[1]}')
+        if self.cols == 0:
+            self.file.write(pack_top(walls[0]).tobytes())
+        self.file.write(pack_rows(walls).tobytes())
+        self.cols += len(walls)
+
+    def close(self, path=None):
+        """Write the optional path of cell ids and the header, then close the file"""
+        if self.file.closed:
+            return
+        if self.cols == 0:
+            raise ValueError('A maze file needs at least one row')
+        path = None if path is None else np.asarray(path, dtype=np.int32)
+        path_offset = HEADER.size + (self.cols + 1) * row_bytes(self.rows)
+        path_offset += -path_offset % 4
+        if path is not None:
+            self.file.seek(path_offset)
+            self.file.write(path.astype('<i4').tobytes())
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, HAS_PATH if path is not None else 0, self.cols, self.rows,
+                                    path_offset, len(path) if path is not None else 0))
+        self.file.close()
+
+
+def save_maze(file_path, maze: Maze, path=None):
+    """Write the maze, and optionally a solver path of cell ids, in the versioned binary format.
+    Walls are taken from the right/bottom side of each cell, so both sides of a wall must agree."""
+    writer = MazeFileWriter(file_path, maze.size[1])
+    writer.write_rows(maze.walls)
+    writer.close(path)
+
+
+def save_rows(file_path, wall_rows, rows: int, batch_rows: int = 1024) -> int:
+    """Stream an iterable of wall rows, e.g. Eller.iter_rows(), into a maze file in constant memory.
+    Returns the number of rows written."""
+    with MazeFileWriter(file_path, rows) as writer:
+        batch = []
+        for walls in wall_rows:
+            batch.append(walls)
+            if len(batch) == batch_rows:
+                writer.write_rows(np.stack(batch))
+                batch.clear()
+        if batch:
+            writer.write_rows(np.stack(batch))
+        return writer.cols
+
+
+class MazeFile:
+    """Memory-mapped view of a saved maze. Opening only reads the header, rows are unpacked on demand
+    and the pages are shared read-only between every process mapping the same file."""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.data = np.memmap(file_path, dtype=np.uint8, mode='r')
+        if len(self.data) < HEADER.size:
+            raise ValueError(f'{file_path} is too short to be a maze file')
+        magic, self.version, self.flags, self.cols, self.rows, path_offset, path_length = \
+            HEADER.unpack(self.data[:HEADER.size].tobytes())
+        if magic != MAGIC:
+            raise ValueError(f'{file_path} is not a maze file')
+        if self.version > VERSION:
+            raise ValueError(f'{file_path} has format version {self.version}, newest supported is {VERSION}')
+
+        record_size = row_bytes(self.rows)
+        self.records = self.data[HEADER.size:HEADER.size + (self.cols + 1) * record_size].reshape(-1, record_size)
+        self.path = None
+        if self.flags & HAS_PATH:
+            self.path = self.data[path_offset:path_offset + 4 * path_length].view('<i4')
+
+    @property
+    def size(self) -> tuple:
+        return self.cols, self.rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.records = self.path = None
+        self.data = None
+
+    def walls(self, y_start: int = 0, y_stop: int = None) -> np.ndarray:
+        """Unpacked uint8 wall bits of cell rows [y_start, y_stop)"""
+        y_stop = self.cols if y_stop is None else y_stop
+        if y_start == 0:
+            above = np.unpackbits(self.records[0], count=self.rows, bitorder='little').astype(bool)
+        else:
+            above = np.unpackbits(self.records[y_start], count=2 * self.rows + 1, bitorder='little')[2::2]
+            above = above.astype(bool)
+        return unpack_rows(self.records[y_start + 1:y_stop + 1], above, self.rows)
+
+    def maze(self) -> Maze:
+        return Maze(self.cols, self.rows, self.walls())
+
+
+def load_maze(file_path) -> tuple:
+    """(maze, path) from a saved file, path is None when none was stored"""
+    with MazeFile(file_path) as maze_file:
+        path = None if maze_file.path is None else np.array(maze_file.path, dtype=np.int32)
+        return maze_file.maze(), path
+
+
+if __name__ == '__main__':
+    import os
+    import tempfile
+    from maze_generators import RandomizedDFS, maze_filler
+    from maze_solvers import BFS
+    from tools import create_empty_maze
+
+    maze = create_empty_maze(300, 400)
+    maze_filler(maze, RandomizedDFS((300, 400)))
+    file_path = os.path.join(tempfile.gettempdir(), 'maze.bin')
+    save_maze(file_path, maze, BFS(maze).solve())
+
+    loaded, path = load_maze(file_path)
+    print(f'{os.path.getsize(file_path)} bytes for {300 * 400} cells, round trip equal: {loaded == maze}, '
+          f'path of {len(path)} cells')
@@ -1,203 +1,532 @@
-from random import choice, randint, shuffle
-from tools import add_tuple, get_direction, reverse_tuple, directions, remove_border
-
-class PlaceholderGenerator:
-    def __init__(self, grid_size: tuple, start_coord: tuple = (0, 0)):
+import heapq
+import random
+from array import array
+import numpy as np
+from instrumentation import instrument, uninstrument
+from tools import ALL_BORDERS, TOP, RIGHT, BOTTOM, LEFT, RandomIdSet
+
+
+def grid_neighbors(cell_id: int, col_len: int, row_len: int) -> list:
+    """Ids of the cells next to cell_id (y * row_len + x), in right, down, left, up order"""
+    x = cell_id % row_len
+    cells = []
+    if x + 1 < row_len:
+        cells.append(cell_id + 1)
+    if cell_id + row_len < col_len * row_len:
+        cells.append(cell_id + row_len)
+    if x > 0:
+        cells.append(cell_id - 1)
+    if cell_id >= row_len:
+        cells.append(cell_id - row_len)
+    return cells
+
+
+class Generator:
+    """Carve event stream shared by the generators. Subclasses implement move(), which advances one
+    step, updates curr_id/prev_id and sets carved when the step opened the passage between them.
+    Cells are integer ids y * row_len + x internally, visited is a bytearray with one byte per cell;
+    curr and prev are the matching (y, x) tuples for the visualizers."""
+    carved = False
+    visited_count = 0
+
+    @property
+    def curr(self) -> tuple:
+        return divmod(self.curr_id, self.row_len)
+
+    @property
+    def prev(self) -> tuple:
+        return divmod(self.prev_id, self.row_len)
+
+    def __iter__(self):
+        """Yield (cell, neighbor) position pairs, one per opened passage, until the maze is finished"""
+        while self.not_finished:
+            self.move()
+            if self.carved:
+                yield self.curr, self.prev
+
+    def iter_batches(self, batch_size: int = 4096):
+        """Yield int32 arrays of shape (k, 2) holding (cell id, neighbor id) carve events"""
+        batch = array('i')
+        append = batch.append
+        while self.not_finished:
+            self.move()
+            if self.carved:
+                append(self.curr_id)
+                append(self.prev_id)
+                if len(batch) >= 2 * batch_size:
+                    yield np.frombuffer(batch, dtype=np.int32).reshape(-1, 2).copy()
+                    del batch[:]
+        if batch:
+            yield np.frombuffer(batch, dtype=np.int32).reshape(-1, 2).copy()
+
+    def mark_visited(self, cell_id: int):
+        self.visited[cell_id] = 1
+        self.visited_count += 1
+
+
+class PlaceholderGenerator(Generator):
+    def __init__(self, grid_size: tuple, start_coord: tuple = (0, 0), rng=None):
         self.col_len, self.row_len = grid_size
-        self.curr = self.prev = start_coord
+        self.rng = rng or random
+        self.curr_id = self.prev_id = start_coord[0] * self.row_len + start_coord[1]
         self.not_finished= False
 
-class HuntAndKill:
-    def __init__(self, grid_size: tuple, start_coord: tuple = (0, 0)):
+class HuntAndKill(Generator):
+    def __init__(self, grid_size: tuple, start_coord: tuple = (0, 0), show_scan=False, rng=None):
         self.col_len, self.row_len = grid_size
+        self.rng = rng or random
         self.max_size = self.col_len * self.row_len
-        self.curr = self.prev = start_coord
-        self.hunter_curr = start_coord
+        self.curr_id = self.prev_id = start_coord[0] * self.row_len + start_coord[1]
+        self.hunter_id = self.curr_id
         self.not_finished = True
-        self.visited = set()
-        self.visited.add(start_coord)
+        self.visited = bytearray(self.max_size)
         self.hunt_mode = False
+        self.phase = 'kill'
+        self.scan_length = 0
+        # show_scan walks the hunter one cell per move() for visualization, otherwise the hunt pops
+        # the first unvisited cell bordering the visited region (in scan order) from a heap
+        self.show_scan = show_scan
+        self.hunt_targets = []
+        self.mark_visited(self.curr_id)
+
+    @property
+    def hunter_curr(self) -> tuple:
+        return divmod(self.hunter_id, self.row_len)
 
     def move(self):
+        if self.show_scan:
+            return self.scan_move()
+
+        move = self.kill()
+        self.carved = True
+        if move is not None:
+            self.phase = 'kill'
+            self.prev_id = self.curr_id
+            self.curr_id = move
+            self.mark_visited(move)
+            return self.curr
+
+        self.phase = 'hunt'
+        cell_id = self.find_hunt_target()
+        if cell_id is None:
+            self.not_finished = False
+            self.carved = False
+            return self.curr
+        self.hunter_id = self.curr_id = cell_id
+        self.prev_id = self.find_passage()
+        self.mark_visited(cell_id)
+        return self.curr
+
+    def scan_move(self):
+        self.carved = False
         if self.hunt_mode:
-            pos = self.hunt()
-            self.hunter_curr = pos
-            if pos not in self.visited and self.not_finished:
-                self.curr = pos
-                self.prev = self.find_passage()
-                self.visited.add(pos)
-                self.hunt_mode = False
+            self.phase = 'hunt'
+            self.scan_length += 1
+            cell_id = self.hunt()
+            if cell_id is not None:
+                self.hunter_id = cell_id
+                if not self.visited[cell_id]:
+                    self.carved = True
+                    self.curr_id = cell_id
+                    self.prev_id = self.find_passage()
+                    self.mark_visited(cell_id)
+                    self.hunt_mode = False
         else:
+            self.phase = 'kill'
             move = self.kill()
-            if not move:
+            if move is None:
                 self.hunt_mode = True
+                self.scan_length = 0
             else:
-                self.visited.add(move)
-                self.prev = self.curr
-                self.curr = move
+                self.carved = True
+                self.mark_visited(move)
+                self.prev_id = self.curr_id
+                self.curr_id = move
 
         return self.curr
 
-    def hunt(self):
-        y, x = self.hunter_curr
-        x += 1
-        if x >= self.row_len:
-            x = 0
-            y += 1
-            if y >= self.col_len:
-                self.not_finished = False
-                return
+    def mark_visited(self, cell_id: int):
+        super().mark_visited(cell_id)
+        if self.show_scan:
+            return
+        if self.visited_count == self.max_size:
+            self.not_finished = False
+        visited = self.visited
+        for neighbor in grid_neighbors(cell_id, self.col_len, self.row_len):
+            if not visited[neighbor]:
+                heapq.heappush(self.hunt_targets, neighbor)
+
+    def find_hunt_target(self):
+        self.scan_length = 0
+        visited = self.visited
+        while self.hunt_targets:
+            cell_id = heapq.heappop(self.hunt_targets)
+            self.scan_length += 1
+            if not visited[cell_id]:
+                return cell_id
+
+    def frontier_size(self):
+        return len(self.hunt_targets)
 
-        return (y, x)
+    def hunt(self):
+        cell_id = self.hunter_id + 1
+        if cell_id >= self.max_size:
+            self.not_finished = False
+            return
 
+        return cell_id
 
     def kill(self):
-        moves = []
-        for move in ((0, 1), (1, 0), (0, -1), (-1, 0)):
-            next_move = add_tuple(self.curr, move)
-            y, x = next_move
-            if next_move not in self.visited and 0 <= y < self.col_len and 0 <= x < self.row_len:
-                moves.append(next_move)
+        visited = self.visited
+        moves = [move for move in grid_neighbors(self.curr_id, self.col_len, self.row_len) if not visited[move]]
         if not moves:
             return
-        shuffle(moves)
+        self.rng.shuffle(moves)
         return moves[0]
 
     def find_passage(self):
         moves = [(0, 1), (1, 0), (0, -1), (-1, 0)]
-        shuffle(moves)
-        for move in moves:
-            passage = add_tuple(self.curr, move)
-            y, x = passage
-            if passage in self.visited and 0 <= y < self.col_len and 0 <= x < self.row_len:
-                return passage
-
-class RandomizedDFS:
-    def __init__(self, grid_size: tuple, start_coord: tuple = (0, 0)):
+        self.rng.shuffle(moves)
+        y, x = self.curr
+        for move_y, move_x in moves:
+            passage_y, passage_x = y + move_y, x + move_x
+            if 0 <= passage_y < self.col_len and 0 <= passage_x < self.row_len:
+                passage = passage_y * self.row_len + passage_x
+                if self.visited[passage]:
+                    return passage
+
+class RandomizedDFS(Generator):
+    def __init__(self, grid_size: tuple, start_coord: tuple = (0, 0), rng=None):
         self.col_len, self.row_len = grid_size
+        self.rng = rng or random
         self.max_size = self.col_len * self.row_len
-        self.curr = self.prev = start_coord
+        self.curr_id = self.prev_id = start_coord[0] * self.row_len + start_coord[1]
         self.not_finished = True
-        self.visited = set()
-        self.visited.add(start_coord)
-        self.stack = []
+        self.visited = bytearray(self.max_size)
+        self.mark_visited(self.curr_id)
+        self.stack = array('i')
 
     def move(self):
         possible_moves = self.possible_moves()
-        self.prev = self.curr
+        self.prev_id = self.curr_id
+        self.carved = bool(possible_moves)
         if possible_moves:
-            move = choice(possible_moves)
-            self.curr = add_tuple(self.curr, move)
-            self.visited.add(self.curr)
-            self.stack.append(self.curr)
+            self.curr_id = self.rng.choice(possible_moves)
+            self.mark_visited(self.curr_id)
+            self.stack.append(self.curr_id)
         else:
             self.stack.pop()
-            self.curr = self.stack[-1]
+            self.curr_id = self.stack[-1]
 
-        if len(self.visited) == self.max_size:
+        if self.visited_count == self.max_size:
             self.not_finished = False
 
         return self.curr
 
     def possible_moves(self):
-        moves = []
-        for move in ((0, 1), (1, 0), (0, -1), (-1, 0)):
-            next_move = add_tuple(self.curr, move)
-            y, x = next_move
-            if next_move not in self.visited and 0 <= y < self.col_len and 0 <= x < self.row_len:
-                moves.append(move)
+        visited = self.visited
+        return [move for move in grid_neighbors(self.curr_id, self.col_len, self.row_len) if not visited[move]]
 
-        return moves
+    def frontier_size(self):
+        return len(self.stack)
 
 
-class RandomizedPrim:
-    def __init__(self, grid_size: tuple, start_coord: tuple = (0, 0), start_at_random=False, start_at_center=True):
+class RandomizedPrim(Generator):
+    def __init__(self, grid_size: tuple, start_coord: tuple = (0, 0), start_at_random=False, start_at_center=True,
+                 rng=None):
         self.col_len, self.row_len = grid_size
+        self.rng = rng or random
         self.max_size = self.col_len * self.row_len
-        self.curr = self.prev = start_coord
+        self.curr_id = self.prev_id = start_coord[0] * self.row_len + start_coord[1]
         if start_at_random:
-            y, x = randint(0, self.col_len - 1), randint(0, self.row_len - 1)
-            self.curr = (y, x)
+            y, x = self.rng.randint(0, self.col_len - 1), self.rng.randint(0, self.row_len - 1)
+            self.curr_id = y * self.row_len + x
         elif start_at_center:
             y, x = self.col_len // 2, self.row_len // 2
-            self.curr = (y, x)
-        self.directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+            self.curr_id = y * self.row_len + x
         self.not_finished = True
-        self.visited = set()
-        self.visited.add(self.curr)
-        self.frontiers = set()
-        self.find_frontiers()
+        self.visited = bytearray(self.max_size)
+        self.mark_visited(self.curr_id)
+        self.frontiers = RandomIdSet(self.max_size)
+        self.find_frontiers(grid_neighbors(self.curr_id, self.col_len, self.row_len))
+        self.carved = True
 
     def move(self):
-        self.curr = choice(tuple(self.frontiers))
-        self.frontiers.remove(self.curr)
-        self.find_frontiers()
-        self.visited.add(self.curr)
-        passage = self.find_passage()
-        self.prev = passage
-        if not self.frontiers or len(self.visited) == self.max_size:
+        self.curr_id = self.frontiers.pop_random(self.rng)
+        neighbors = grid_neighbors(self.curr_id, self.col_len, self.row_len)
+        self.find_frontiers(neighbors)
+        self.mark_visited(self.curr_id)
+        self.prev_id = self.find_passage(neighbors)
+        if not self.frontiers or self.visited_count == self.max_size:
             self.not_finished = False
         return self.curr
 
-    def find_frontiers(self):
-        for direction in self.directions:
-            frontier = add_tuple(self.curr, direction)
-            y, x = frontier
-            if frontier not in self.visited and 0 <= y < self.col_len and 0 <= x < self.row_len:
+    def find_frontiers(self, neighbors):
+        visited = self.visited
+        for frontier in neighbors:
+            if not visited[frontier]:
                 self.frontiers.add(frontier)
 
-    def find_passage(self):
-        shuffle(self.directions)
-        for direction in self.directions:
-            passage = add_tuple(self.curr, direction)
-            if passage in self.visited:
-                return passage
+    def find_passage(self, neighbors):
+        visited = self.visited
+        passages = [passage for passage in neighbors if visited[passage]]
+        return self.rng.choice(passages)
 
+    def frontier_size(self):
+        return len(self.frontiers)
 
-def maze_filler(maze, generator, step_by_step=False, paused=False):
-    while generator.not_finished and not paused:
-        coord = generator.move()
-        prev_coord = generator.prev
 
-        y, x = coord
-        prev_y, prev_x = prev_coord
+class RandomizedKruskal(Generator):
+    """Randomized Kruskal: every wall between two cells is an edge, the edges are shuffled once up front and
+    carved in that order whenever they join two separate trees. Trees are tracked by an array-backed union-find
+    with path compression and union by rank, so a whole maze costs near-linear time and a few bytes per cell.
+    Edge e stands for the wall right of cell e >> 1, or below it when e & 1. Like Eller there is no visited array,
+    every union joins one more cell to the spanning tree so visited_count is unions + 1."""
 
-        curr_cell = maze[y][x]
-        prev_cell = maze[prev_y][prev_x]
+    def __init__(self, grid_size: tuple, rng=None):
+        self.col_len, self.row_len = grid_size
+        self.rng = rng or random
+        self.max_size = self.col_len * self.row_len
+        self.curr_id = self.prev_id = 0
+        self.not_finished = self.max_size > 1
+        self.visited_count = 1
+        self.parents = array('i', range(self.max_size))
+        self.ranks = bytearray(self.max_size)
+        self.unions = 0
+
+        cell_ids = np.arange(self.max_size, dtype=np.int32)
+        right = cell_ids[cell_ids % self.row_len < self.row_len - 1] << 1
+        down = (cell_ids[:self.max_size - self.row_len] << 1) | 1
+        # The shuffle runs in NumPy, seeded from rng so a seeded rng still gives the same maze
+        shuffled = np.random.default_rng(self.rng.getrandbits(64)).permutation(np.concatenate([right, down]))
+        self.edges = array('i', shuffled.astype(np.int32).tobytes())
+        self.edge_index = 0
+
+    def find(self, cell_id: int) -> int:
+        parents = self.parents
+        root = cell_id
+        while parents[root] != root:
+            root = parents[root]
+        while parents[cell_id] != root:  # Point the whole path at the root
+            parents[cell_id], cell_id = root, parents[cell_id]
+        return root
+
+    def union(self, root: int, other_root: int):
+        ranks = self.ranks
+        if ranks[root] < ranks[other_root]:
+            root, other_root = other_root, root
+        self.parents[other_root] = root
+        if ranks[root] == ranks[other_root]:
+            ranks[root] += 1
+        self.unions += 1
+        self.visited_count = self.unions + 1
 
-        direction = get_direction(coord, prev_coord)
-        reversed_direction = reverse_tuple(direction)
+    def move(self):
+        edges, find, row_len = self.edges, self.find, self.row_len
+        while True:  # Skip edges inside one tree, a move always carves
+            edge = edges[self.edge_index]
+            self.edge_index += 1
+            cell_id = edge >> 1
+            neighbor = cell_id + row_len if edge & 1 else cell_id + 1
+            root, neighbor_root = find(cell_id), find(neighbor)
+            if root != neighbor_root:
+                break
 
-        direction_name = directions[direction]
-        reversed_direction_name = directions[reversed_direction]
+        self.union(root, neighbor_root)
+        self.prev_id, self.curr_id = cell_id, neighbor
+        self.carved = True
+        if self.unions == self.max_size - 1:
+            self.not_finished = False
+        return self.curr
+
+    def iter_batches(self, batch_size: int = 4096):
+        """Same carve events as move(), with the union-find inlined in one loop over the remaining edges"""
+        if 'move' in self.__dict__:  # Instrumented, every step has to go through the recording move()
+            yield from super().iter_batches(batch_size)
+            return
+        parents, ranks, row_len = self.parents, self.ranks, self.row_len
+        batch = array('i')
+        append = batch.append
+        for edge in self.edges[self.edge_index:]:
+            if not self.not_finished:
+                break
+            self.edge_index += 1
+            cell_id = edge >> 1
+            neighbor = cell_id + row_len if edge & 1 else cell_id + 1
+
+            root = cell_id
+            while parents[root] != root:
+                parents[root] = root = parents[parents[root]]  # Path halving
+            neighbor_root = neighbor
+            while parents[neighbor_root] != neighbor_root:
+                parents[neighbor_root] = neighbor_root = parents[parents[neighbor_root]]
+            if root == neighbor_root:
+                continue
+
+            if ranks[root] < ranks[neighbor_root]:
+                root, neighbor_root = neighbor_root, root
+            parents[neighbor_root] = root
+            if ranks[root] == ranks[neighbor_root]:
+                ranks[root] += 1
+            self.unions += 1
+            self.not_finished = self.unions < self.max_size - 1
+            append(neighbor)
+            append(cell_id)
+            if len(batch) >= 2 * batch_size or not self.not_finished:
+                yield self.take_batch(batch)
+
+    def take_batch(self, batch: array) -> np.ndarray:
+        """Empty batch into a (k, 2) events array, catching up curr, prev and visited_count"""
+        events = np.frombuffer(batch, dtype=np.int32).reshape(-1, 2).copy()
+        del batch[:]
+        self.curr_id, self.prev_id = (int(cell_id) for cell_id in events[-1])
+        self.carved = True
+        self.visited_count = self.unions + 1
+        return events
+
+    def frontier_size(self):
+        return len(self.edges) - self.edge_index
+
+
+class Eller(Generator):
+    """Eller's algorithm: the maze is built one row at a time and only the set labels of the current row are kept,
+    so memory is O(row_len) however tall the maze is. iter_rows() streams the finished wall rows, move() replays
+    the same passages one at a time for maze_filler and the visualizers. Use one or the other per instance,
+    both draw from the same rng. There is no visited array, visited_count grows by the one cell each passage joins."""
+
+    def __init__(self, grid_size: tuple, join_chance=0.5, down_chance=0.5, rng=None):
+        self.col_len, self.row_len = grid_size
+        self.rng = rng or random
+        self.join_chance = join_chance
+        self.down_chance = down_chance
+        self.curr_id = self.prev_id = 0
+        self.events = None  # Started by the first move(), so iter_rows() alone sees a fresh rng
+        self.next_event = None
+        self.not_finished = self.col_len * self.row_len > 1
+        self.visited_count = 1
+        self.live_sets = self.row_len
+
+    def iter_row_passages(self):
+        """Yield (right, down) boolean lists per row,
+        right[x] opens (y, x)-(y, x + 1) and down[x] opens (y, x)-(y + 1, x)"""
+        rng = self.rng
+        width = self.row_len
+        labels = list(range(width))
+        members = {label: [label] for label in labels}
+        next_label = width
+
+        for y in range(self.col_len):
+            last_row = y == self.col_len - 1
+            right = [False] * (width - 1)
+            for x in range(width - 1):
+                label, other = labels[x], labels[x + 1]
+                if label != other and (last_row or rng.random() < self.join_chance):
+                    right[x] = True
+                    if len(members[label]) < len(members[other]):
+                        label, other = other, label
+                    cells = members.pop(other)
+                    for cell in cells:
+                        labels[cell] = label
+                    members[label].extend(cells)
+            self.live_sets = len(members)
+
+            down = [False] * width
+            if not last_row:
+                for cells in members.values():  # Every set continues into the next row at least once
+                    chosen = [cell for cell in cells if rng.random() < self.down_chance] or [rng.choice(cells)]
+                    for cell in chosen:
+                        down[cell] = True
+
+                members = {}
+                for x in range(width):
+                    if not down[x]:
+                        labels[x] = next_label
+                        next_label += 1
+                    members.setdefault(labels[x], []).append(x)
+            yield right, down
+
+    def iter_events(self):
+        row_len = self.row_len
+        for y, (right, down) in enumerate(self.iter_row_passages()):
+            row_start = y * row_len
+            for x, is_open in enumerate(right):
+                if is_open:
+                    yield row_start + x + 1, row_start + x
+            for x, is_open in enumerate(down):
+                if is_open:
+                    yield row_start + row_len + x, row_start + x
+
+    def iter_rows(self):
+        """Yield the finished uint8 wall row of every cell row, top to bottom"""
+        top_open = np.zeros(self.row_len, dtype=bool)
+        for right, down in self.iter_row_passages():
+            right, down = np.array(right, dtype=bool), np.array(down, dtype=bool)
+            walls = np.full(self.row_len, ALL_BORDERS, dtype=np.uint8)
+            walls[top_open] &= ALL_BORDERS ^ TOP
+            walls[:-1][right] &= ALL_BORDERS ^ RIGHT
+            walls[1:][right] &= ALL_BORDERS ^ LEFT
+            walls[down] &= ALL_BORDERS ^ BOTTOM
+            yield walls
+            top_open = down
 
-        remove_border(curr_cell, direction_name)
-        remove_border(prev_cell, reversed_direction_name)
+    def move(self):
+        if self.events is None:
+            self.events = self.iter_events()
+            self.next_event = next(self.events)
+        self.curr_id, self.prev_id = self.next_event
+        self.carved = True
+        self.visited_count += 1  # Every passage joins two trees, i.e. adds one cell to the spanning tree
+        self.next_event = next(self.events, None)
+        if self.next_event is None:
+            self.not_finished = False
+        return self.curr
 
+    def frontier_size(self):
+        """Sets left in the row being carved after its horizontal joins"""
+        return self.live_sets
+
+
+def maze_filler(maze, generator, step_by_step=False, paused=False, recorder=None):
+    """Carve the generator's passages into maze, a single move() per call when step_by_step"""
+    carve, carve_events = maze.carve, maze.carve_events
+    if recorder is not None:
+        instrument(generator, recorder)
+        carve = recorder.timed(carve, 'carve')
+        carve_events = recorder.timed(carve_events, 'carve')
+
+    try:
+        if paused or not generator.not_finished:
+            return
         if step_by_step:
-            break
+            generator.move()
+            if generator.carved:
+                carve(generator.curr, generator.prev)
+            return
+        for events in generator.iter_batches():
+            carve_events(events)
+    finally:
+        if recorder is not None:
+            uninstrument(generator)
 
 
 if __name__ == '__main__':
-    from time import sleep
+    from analysis import analyze
     from tools import create_empty_maze
-    from maze_solvers import DFS
     cols, rows = 20, 20
 
     size = (cols, rows)
+    mazes = []
     for i in range(10):
         generator = HuntAndKill(size)
         maze = create_empty_maze(cols, rows)
 
         while generator.not_finished:
             maze_filler(maze,generator,step_by_step=True)
+        mazes.append(maze)
 
-        solver = DFS(maze)
-
-        while solver.not_finished:
-            if not solver.queue:
-                print(f'Generation {i + 1}: Not solvable')
-                break
-            solver.move()
+    results = analyze(mazes)
+    for i, (length, perfect) in enumerate(zip(results['solution_length'], results['perfect'])):
+        if length >= 0:
+            print(f'Generation {i + 1}: Solved in {length} steps, {"perfect" if perfect else "not perfect"}')
         else:
-            print(f'Generation {i + 1}: Solved')
\ No newline at end of file
+            print(f'Generation {i + 1}: Not solvable')
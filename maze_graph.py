@@ -0,0 +1,79 @@
+from array import array
+from functools import cached_property
+
+import numpy as np
+
+from tools import Maze, TOP, RIGHT, BOTTOM, LEFT
+
+
+class MazeGraph:
+    """Passages of a finished maze in CSR form, cell ids are y * rows + x.
+    Neighbours of cell i are neighbors[offsets[i]:offsets[i + 1]], in right, bottom, left, top order."""
+
+    def __init__(self, cols: int, rows: int, offsets: np.ndarray, neighbors: np.ndarray):
+        self.cols, self.rows = cols, rows
+        self.offsets = offsets
+        self.neighbors = neighbors
+
+    def __len__(self):
+        return self.cols * self.rows
+
+    @property
+    def size(self) -> tuple:
+        return self.cols, self.rows
+
+    def cell_id(self, pos: tuple) -> int:
+        y, x = pos
+        return y * self.rows + x
+
+    def cell_pos(self, cell_id: int) -> tuple:
+        return divmod(cell_id, self.rows)
+
+    @cached_property
+    def offset_list(self) -> array:
+        return array('i', self.offsets.astype(np.int32).tobytes())
+
+    @cached_property
+    def neighbor_list(self) -> array:
+        """array('i') copy of neighbors, made once so solvers index plain ints instead of NumPy scalars per edge,
+        at 4 bytes per entry instead of a Python list's 8-byte pointers to int objects"""
+        return array('i', self.neighbors.astype(np.int32).tobytes())
+
+    def passages(self, cell_id: int) -> array:
+        offsets = self.offset_list
+        return self.neighbor_list[offsets[cell_id]:offsets[cell_id + 1]]
+
+
+def compile_maze(maze: Maze) -> MazeGraph:
+    cols, rows = maze.size
+    walls = maze.walls
+    x = np.arange(rows)
+    y = np.arange(cols)[:, None]
+
+    steps = (1, rows, -1, -rows)
+    open_masks = (
+        ((walls & RIGHT) == 0) & (x < rows - 1),
+        ((walls & BOTTOM) == 0) & (y < cols - 1),
+        ((walls & LEFT) == 0) & (x > 0),
+        ((walls & TOP) == 0) & (y > 0),
+    )
+    is_open = np.stack([mask.ravel() for mask in open_masks], axis=1)
+
+    ids = np.arange(cols * rows, dtype=np.int32)
+    candidates = ids[:, None] + np.array(steps, dtype=np.int32)
+
+    offsets = np.zeros(cols * rows + 1, dtype=np.int32)
+    np.cumsum(is_open.sum(axis=1), out=offsets[1:])
+    neighbors = candidates[is_open]
+    return MazeGraph(cols, rows, offsets, neighbors)
+
+
+if __name__ == '__main__':
+    from maze_generators import RandomizedDFS, maze_filler
+    from tools import create_empty_maze
+
+    maze = create_empty_maze(3, 4)
+    maze_filler(maze, RandomizedDFS((3, 4)))
+    graph = compile_maze(maze)
+    for cell_id in range(len(graph)):
+        print(graph.cell_pos(cell_id), [graph.cell_pos(passage) for passage in graph.passages(cell_id)])
@@ -1,160 +1,302 @@
-from tools import add_tuple, directions
-from collections import deque
+from maze_graph import MazeGraph, compile_maze
+from tools import Maze
+from array import array
+from sys import maxsize
 import heapq
+import numpy as np
+
+UNSEEN = -2
 
 
 class PlaceholderSolver:
-    def __init__(self, maze: list[list], start: tuple = (0, 0), end: tuple = None):
+    def __init__(self, maze: Maze, start: tuple = (0, 0), end: tuple = None):
         self.not_finished = False
         self.maze = maze
         self.curr = start
 
 
-class BFS:
-    def __init__(self, maze: list[list], start: tuple = (0, 0), end: tuple = None):
-        self.direction_names = directions
-        self.not_finished = True
+class GraphSolver:
+    """Common state for solvers walking a compiled MazeGraph, a raw Maze is compiled on the fly.
+    Cells are tracked by integer id internally, curr stays a (y, x) tuple for the visualizers.
+    visited holds one byte per cell and parents (an int32 array) maps every discovered cell to the cell
+    it was reached from, UNSEEN for undiscovered cells, so the route can be rebuilt."""
+
+    def __init__(self, maze, start: tuple = (0, 0), end: tuple = None):
         self.maze = maze
-        self.cols, self.rows = len(maze), len(maze[0])
+        self.graph = maze if isinstance(maze, MazeGraph) else compile_maze(maze)
+        self.offsets = self.graph.offset_list
+        self.neighbors = self.graph.neighbor_list
+        self.not_finished = True
+        self.cols, self.rows = self.graph.size
+        self.size = len(self.graph)
+        self.start = start
         self.end = (self.cols - 1, self.rows - 1)
         if end:
             self.end = end
-        self.curr = start
-        self.visited = set()
-        self.visited.add(start)
-        self.queue = deque()
+        self.end_id = self.graph.cell_id(self.end)
+        self.curr_id = self.graph.cell_id(start)
+        self.visited = bytearray(self.size)
+        self.visited_count = 0
+        self.visit(self.curr_id)
+        self.parents = array('i', [UNSEEN]) * self.size
+        self.parents[self.curr_id] = -1
+        self.nodes_expanded = 0
+
+    @property
+    def curr(self) -> tuple:
+        return divmod(self.curr_id, self.rows)
+
+    @property
+    def found(self) -> bool:
+        return bool(self.visited[self.end_id])
+
+    def solve(self) -> np.ndarray:
+        while self.not_finished:
+            self.move()
+        return self.path()
+
+    def path(self) -> np.ndarray:
+        """Cell ids from start to end, empty if the end has not been reached"""
+        if not self.found:
+            return np.empty(0, dtype=np.int32)
+        path = []
+        cell_id = self.end_id
+        while cell_id != -1:
+            path.append(cell_id)
+            cell_id = self.parents[cell_id]
+        return np.array(path[::-1], dtype=np.int32)
+
+    def visit(self, cell_id: int):
+        if not self.visited[cell_id]:
+            self.visited[cell_id] = 1
+            self.visited_count += 1
+
+    def visited_ids(self) -> np.ndarray:
+        return np.flatnonzero(np.frombuffer(self.visited, dtype=np.uint8)).astype(np.int32)
+
+    def record_parents(self, passages):
+        parents = self.parents
+        for passage in passages:
+            if parents[passage] == UNSEEN:
+                parents[passage] = self.curr_id
+
+    def find_passages(self):
+        visited = self.visited
+        offsets = self.offsets
+        cell_id = self.curr_id
+        passages = self.neighbors[offsets[cell_id]:offsets[cell_id + 1]]
+        return [passage for passage in passages if not visited[passage]]
+
+    def manhattan_distance(self, cell_id: int) -> int:
+        y1, x1 = divmod(cell_id, self.rows)
+        y2, x2 = self.end
+        dist = abs(x1 - x2) + abs(y1 - y2)
+        return dist
+
+
+class BFS(GraphSolver):
+    """Queue is an int32 array read from head onwards, popped cells are not removed"""
+
+    def __init__(self, maze, start: tuple = (0, 0), end: tuple = None):
+        super().__init__(maze, start, end)
+        self.queue = array('i')
+        self.head = 0
         self.queue.extend(self.find_passages())
+        self.record_parents(self.queue)
+        self.not_finished = bool(self.queue)
 
     def move(self):
-        self.curr = self.queue.popleft()
+        self.curr_id = self.queue[self.head]
+        self.head += 1
+        self.nodes_expanded += 1
         passages = self.find_passages()
         if passages:
+            self.record_parents(passages)
             self.queue.extend(passages)
-        self.visited.add(self.curr)
-        if self.curr == self.end or not self.queue:
+        self.visit(self.curr_id)
+        if self.curr_id == self.end_id or self.head == len(self.queue):
             self.not_finished = False
 
-    def find_passages(self):
-        passages = []
-        y, x = self.curr
-        cell_directions = self.maze[y][x].__dict__
-
-        for direction in ((0, 1), (1, 0), (0, -1), (-1, 0)):
-
-            dir_name = self.direction_names[direction]
-            if cell_directions[dir_name]:
-                continue
-            move = add_tuple(self.curr, direction)
-            if move not in self.visited:
-                passages.append(move)
-
-        return passages
+    def frontier_size(self):
+        return len(self.queue) - self.head
 
 
-class DFS:
-    def __init__(self, maze: list[list], start: tuple = (0, 0), end: tuple = None, manhattan_distance=True):
-        self.direction_names = directions
+class DFS(GraphSolver):
+    def __init__(self, maze, start: tuple = (0, 0), end: tuple = None, manhattan_distance=True):
+        super().__init__(maze, start, end)
         self.use_manhattan_distance = manhattan_distance
-        self.not_finished = True
-        self.maze = maze
-        self.cols, self.rows = len(maze), len(maze[0])
-        self.start = start
-        self.end = (self.cols - 1, self.rows - 1)
-        if end:
-            self.end = end
-        self.curr = start
-        self.visited = set()
-        self.visited.add(start)
-        self.queue = []
+        self.queue = array('i')
         self.queue.extend(self.find_passages())
+        self.record_parents(self.queue)
+        self.not_finished = bool(self.queue)
 
     def move(self):
-        self.curr = self.queue.pop()
+        self.curr_id = self.queue.pop()
+        self.nodes_expanded += 1
         passages = self.find_passages()
         if passages:
+            self.record_parents(passages)
             self.queue.extend(passages)
-        self.visited.add(self.curr)
-        if self.curr == self.end:
+        self.visit(self.curr_id)
+        if self.curr_id == self.end_id or not self.queue:
             self.not_finished = False
 
+    def frontier_size(self):
+        return len(self.queue)
+
     def find_passages(self):
-        passages = []
-        y, x = self.curr
-        cell_directions = self.maze[y][x].__dict__
-
-        for direction in ((0, 1), (1, 0), (0, -1), (-1, 0)):
-
-            dir_name = self.direction_names[direction]
-            if cell_directions[dir_name]:
-                continue
-            move = add_tuple(self.curr, direction)
-            if move not in self.visited:
-                passages.append(move)
-        if self.use_manhattan_distance:
+        passages = super().find_passages()
+        if self.use_manhattan_distance and len(passages) > 1:
             passages.sort(key=self.manhattan_distance, reverse=True)
         return passages
 
-    def manhattan_distance(self, pos):
-        y1, x1 = pos
-        y2, x2 = self.end
-        dist = abs(x1 - x2) + abs(y1 - y2)
-        return dist
 
+class PriorityDFS(GraphSolver):
+    """Heap entries are single ints, distance * size + cell id, so they order like (distance, id) pairs"""
 
-class PriorityDFS:
-    def __init__(self, maze: list[list], start: tuple = (0, 0), end: tuple = None, manhattan_distance=True):
-        self.direction_names = directions
+    def __init__(self, maze, start: tuple = (0, 0), end: tuple = None, manhattan_distance=True):
+        super().__init__(maze, start, end)
         self.use_manhattan_distance = manhattan_distance
-        self.not_finished = True
-        self.maze = maze
-        self.cols, self.rows = len(maze), len(maze[0])
-        self.end = (self.cols - 1, self.rows - 1)
-        if end:
-            self.end = end
-        self.curr = start
-        self.visited = set()
-        self.visited.add(start)
         self.heap = []
-        self.heap.extend(self.find_passages())
-        heapq.heapify(self.heap)
+        passages = self.find_passages()
+        self.record_parents(passages)
+        self.push_passages(passages)
+        self.not_finished = bool(self.heap)
 
     def move(self):
-        heap_top = heapq.heappop(self.heap)
-        print(heap_top)
-        pos = heap_top[1]
-        self.curr = pos
+        self.curr_id = heapq.heappop(self.heap) % self.size
+        self.nodes_expanded += 1
         passages = self.find_passages()
         if passages:
-            for val in passages:
-                heapq.heappush(self.heap, val)
+            self.record_parents(passages)
+            self.push_passages(passages)
 
-        self.visited.add(self.curr)
-        if self.curr == self.end:
+        self.visit(self.curr_id)
+        if self.curr_id == self.end_id or not self.heap:
             self.not_finished = False
 
-    def find_passages(self):
-        passages = []
-        y, x = self.curr
-        cell_directions = self.maze[y][x].__dict__
+    def frontier_size(self):
+        return len(self.heap)
 
-        for direction in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+    def push_passages(self, passages):
+        for passage in passages:
+            heapq.heappush(self.heap, self.manhattan_distance(passage) * self.size + passage)
 
-            dir_name = self.direction_names[direction]
-            if cell_directions[dir_name]:
-                continue
-            move = add_tuple(self.curr, direction)
-            if move not in self.visited:
-                m_dist = self.manhattan_distance(move)
-                val = (m_dist, move)
-                passages.append(val)
 
-        return passages
+class AStar(GraphSolver):
+    """A* with the Manhattan heuristic, ties on f go to the cell closer to the end.
+    Heap entries are single ints packing (f, h, cell id), costs is an int32 array with -1 for unreached cells."""
 
-    def manhattan_distance(self, pos):
-        y1, x1 = pos
-        y2, x2 = self.end
-        dist = abs(x1 - x2) + abs(y1 - y2)
-        return dist
+    def __init__(self, maze, start: tuple = (0, 0), end: tuple = None):
+        super().__init__(maze, start, end)
+        self.span = self.cols + self.rows  # Bound on h, so f * span + h keeps the (f, h) order
+        self.costs = array('i', [-1]) * self.size
+        self.costs[self.curr_id] = 0
+        self.heap = []
+        self.push_passages()
+        self.not_finished = bool(self.heap)
+
+    def move(self):
+        self.curr_id = heapq.heappop(self.heap) % self.size
+        self.nodes_expanded += 1
+        self.visit(self.curr_id)
+        self.push_passages()
+        while self.heap and self.visited[self.heap[0] % self.size]:
+            heapq.heappop(self.heap)
+        if self.curr_id == self.end_id or not self.heap:
+            self.not_finished = False
+
+    def frontier_size(self):
+        return len(self.heap)
+
+    def push_passages(self):
+        costs = self.costs
+        cost = costs[self.curr_id] + 1
+        for passage in self.find_passages():
+            if costs[passage] < 0 or cost < costs[passage]:
+                costs[passage] = cost
+                self.parents[passage] = self.curr_id
+                distance = self.manhattan_distance(passage)
+                heapq.heappush(self.heap, ((cost + distance) * self.span + distance) * self.size + passage)
+
+
+class BidirectionalBFS(GraphSolver):
+    """BFS from both ends at once, every move expands one cell of the side with the smaller queue.
+    Stops once no unexpanded pair of cells could still join into a shorter route than the best meeting.
+    Each side keeps an int32 queue with a head index and an int32 distance array, -1 for undiscovered cells."""
+
+    def __init__(self, maze, start: tuple = (0, 0), end: tuple = None):
+        super().__init__(maze, start, end)
+        self.start_id = self.curr_id
+        self.queues = (array('i', [self.start_id]), array('i', [self.end_id]))
+        self.heads = [0, 0]
+        self.distances = (array('i', [-1]) * self.size, array('i', [-1]) * self.size)
+        self.distances[0][self.start_id] = 0
+        self.distances[1][self.end_id] = 0
+        self.end_parents = array('i', [UNSEEN]) * self.size
+        self.end_parents[self.end_id] = -1
+        self.best_length = maxsize
+        self.meeting = None
+        if self.start_id == self.end_id:
+            self.best_length = 0
+            self.meeting = (self.start_id, self.end_id)
+        self.visited[self.start_id] = 0
+        self.visited_count = 0
+        self.not_finished = self.meeting is None
+
+    @property
+    def found(self) -> bool:
+        return self.meeting is not None
+
+    def queue_length(self, side: int) -> int:
+        return len(self.queues[side]) - self.heads[side]
+
+    def move(self):
+        side = 0 if self.queue_length(0) <= self.queue_length(1) else 1
+        queue, distances = self.queues[side], self.distances[side]
+        other_distances = self.distances[1 - side]
+        parents = self.parents if side == 0 else self.end_parents
+
+        self.curr_id = cell_id = queue[self.heads[side]]
+        self.heads[side] += 1
+        self.nodes_expanded += 1
+        self.visit(cell_id)
+        offsets = self.offsets
+        distance = distances[cell_id] + 1
+        for passage in self.neighbors[offsets[cell_id]:offsets[cell_id + 1]]:
+            if distances[passage] < 0:
+                distances[passage] = distance
+                parents[passage] = cell_id
+                queue.append(passage)
+            if other_distances[passage] >= 0 and distance + other_distances[passage] < self.best_length:
+                self.best_length = distance + other_distances[passage]
+                self.meeting = (cell_id, passage) if side == 0 else (passage, cell_id)
+
+        forward, backward = self.queues
+        if not self.queue_length(0) or not self.queue_length(1):
+            self.not_finished = False
+        elif self.distances[0][forward[self.heads[0]]] + self.distances[1][backward[self.heads[1]]] + 1 \
+                >= self.best_length:
+            self.not_finished = False
+
+    def frontier_size(self):
+        return self.queue_length(0) + self.queue_length(1)
+
+    def path(self) -> np.ndarray:
+        if not self.found:
+            return np.empty(0, dtype=np.int32)
+        forward_cell, backward_cell = self.meeting
+        path = []
+        while forward_cell != -1:
+            path.append(forward_cell)
+            forward_cell = self.parents[forward_cell]
+        path.reverse()
+        if backward_cell == path[-1]:
+            backward_cell = self.end_parents[backward_cell]
+        while backward_cell != -1:
+            path.append(backward_cell)
+            backward_cell = self.end_parents[backward_cell]
+        return np.array(path, dtype=np.int32)
 
 
 if __name__ == '__main__':
@@ -164,9 +306,9 @@ if __name__ == '__main__':
     maze = create_empty_maze(100, 100)
     generator = RandomizedDFS((100, 100))
     maze_filler(maze, generator)
-    solver = DFS(maze)
-
-    while solver.not_finished:
-        solver.move()
+    graph = compile_maze(maze)
 
-    print('Done')
+    for solver_class in (DFS, BFS, PriorityDFS, AStar, BidirectionalBFS):
+        solver = solver_class(graph)
+        path = solver.solve()
+        print(f'{solver_class.__name__}: path of {len(path)} cells, {solver.nodes_expanded} nodes expanded')
@@ -0,0 +1,180 @@
+"""Command line entry point: python mazes.py <command> or python -m mazes <command>.
+Batch commands import only the algorithmic modules, pygame and PySimpleGUI are loaded by show and gui alone."""
+import argparse
+import sys
+import time
+
+
+def algorithm_class(module, name: str):
+    """Steppable class of that name, the same filter as benchmark.algorithm_classes"""
+    cls = getattr(module, name, None)
+    if not isinstance(cls, type) or not hasattr(cls, 'move'):
+        raise SystemExit(f'{module.__name__} has no algorithm named {name}')
+    return cls
+
+
+def check_cell(parser, option: str, cell, size: tuple):
+    if not all(0 <= value < limit for value, limit in zip(cell, size)):
+        parser.error(f'{option} {cell[0]} {cell[1]} is outside the {size[0]}x{size[1]} maze')
+
+
+def build_maze(generator_name: str, size: tuple, seed: int):
+    import random
+    import maze_generators
+    from tools import create_empty_maze
+
+    maze = create_empty_maze(*size)
+    generator = algorithm_class(maze_generators, generator_name)(size, rng=random.Random(seed))
+    maze_generators.maze_filler(maze, generator)
+    return maze
+
+
+def generate(args):
+    size = tuple(args.size)
+    if args.count > 1:
+        import bulk
+        import maze_generators
+
+        jobs = bulk.make_jobs(algorithm_class(maze_generators, args.generator), size, args.count, args.seed)
+        bulk.write_bulk(args.output, jobs, workers=args.workers)
+        print(f'{args.count} mazes written to {args.output}')
+        return 0
+
+    from maze_file import save_maze
+
+    start = time.perf_counter()
+    maze = build_maze(args.generator, size, args.seed)
+    print(f'{args.generator} {size[0]}x{size[1]} generated in {time.perf_counter() - start:.3f} s')
+    save_maze(args.output, maze)
+    return 0
+
+
+def solve(args):
+    import maze_solvers
+    from maze_file import load_maze, save_maze
+    from maze_graph import compile_maze
+
+    maze, _ = load_maze(args.input)
+    check_cell(args.parser, '--start', args.start, maze.size)
+    if args.end:
+        check_cell(args.parser, '--end', args.end, maze.size)
+    solver = algorithm_class(maze_solvers, args.solver)(compile_maze(maze), tuple(args.start),
+                                                          tuple(args.end) if args.end else None)
+    start = time.perf_counter()
+    path = solver.solve()
+    print(f'{args.solver}: {solver.nodes_expanded} steps in {time.perf_counter() - start:.3f} s, '
+          f'path of {len(path)} cells')
+    if args.output:
+        save_maze(args.output, maze, path)
+    return 0 if len(path) else 1
+
+
+def bench(args, extra: list):
+    import benchmark
+
+    return benchmark.main(extra)
+
+
+def export(args):
+    import export
+    import maze_solvers
+    from maze_file import load_maze
+
+    maze, path = load_maze(args.input)
+    overlays = {} if path is None else {'path': path}
+    if args.solver:
+        solver = algorithm_class(maze_solvers, args.solver)(maze)
+        overlays['path'] = solver.solve()
+        overlays['visited'] = solver.visited_ids()
+    export.export_image(args.output, maze, cell_size=args.cell_size, border_size=args.border_size,
+                        band_rows=args.band_rows, **overlays)
+    return 0
+
+
+def show(args):
+    import maze_generators
+    import maze_solvers
+    import main
+
+    main.run(algorithm_class(maze_generators, args.generator), algorithm_class(maze_solvers, args.solver),
+             tuple(args.size), args.cell_size, args.speed)
+    return 0
+
+
+def gui(args):
+    import maze_generators
+    import maze_solvers
+    import layout
+
+    for option, names in (('--generators', args.generators), ('--solvers', args.solvers)):
+        if len(names) > 4:
+            args.parser.error(f'{option} takes at most 4 names, one per canvas')
+    layout.run([algorithm_class(maze_generators, name) for name in args.generators],
+               [algorithm_class(maze_solvers, name) for name in args.solvers], tuple(args.size), args.cell_size)
+    return 0
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='mazes', description='Generate, solve, time and draw mazes')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('generate', help='generate a maze file, or a bulk file with --count')
+    command.add_argument('output', help='.maze file, raw wall records with --count')
+    command.add_argument('--generator', default='RandomizedDFS')
+    command.add_argument('--size', type=int, nargs=2, default=(100, 100), metavar=('COLS', 'ROWS'))
+    command.add_argument('--seed', type=int, default=0, help='seed of the first maze, maze i uses seed + i')
+    command.add_argument('--count', type=int, default=1)
+    command.add_argument('--workers', type=int, default=None, help='process count for --count')
+    command.set_defaults(handler=generate)
+
+    command = commands.add_parser('solve', help='solve a maze file')
+    command.add_argument('input', help='.maze file')
+    command.add_argument('--solver', default='BFS')
+    command.add_argument('--start', type=int, nargs=2, default=(0, 0), metavar=('Y', 'X'))
+    command.add_argument('--end', type=int, nargs=2, metavar=('Y', 'X'), help='bottom right by default')
+    command.add_argument('--output', help='.maze file to save the maze with its path')
+    command.set_defaults(handler=solve, parser=command)
+
+    command = commands.add_parser('bench', help='time the generators and solvers, options as in benchmark.py',
+                                  add_help=False)
+    command.set_defaults(handler=bench)
+
+    command = commands.add_parser('export', help='draw a maze file as a PNG or PPM image')
+    command.add_argument('input', help='.maze file, a stored path is drawn')
+    command.add_argument('output', help='.png or .ppm file')
+    command.add_argument('--solver', help='overlay the visited cells and path of this solver')
+    command.add_argument('--cell-size', type=int, default=4)
+    command.add_argument('--border-size', type=int, default=1)
+    command.add_argument('--band-rows', type=int, default=64, help='cell rows rasterized at a time')
+    command.set_defaults(handler=export)
+
+    command = commands.add_parser('show', help='animate one generator and solver with pygame')
+    command.add_argument('--generator', default='HuntAndKill')
+    command.add_argument('--solver', default='DFS')
+    command.add_argument('--size', type=int, nargs=2, default=(15, 15), metavar=('COLS', 'ROWS'))
+    command.add_argument('--cell-size', type=int, default=30)
+    command.add_argument('--speed', type=int, default=30, help='steps per second')
+    command.set_defaults(handler=show)
+
+    command = commands.add_parser('gui', help='compare generators and solvers side by side with PySimpleGUI')
+    command.add_argument('--generators', nargs='+', metavar='NAME',
+                         default=['RandomizedDFS', 'RandomizedPrim', 'HuntAndKill', 'RandomizedKruskal'])
+    command.add_argument('--solvers', nargs='+', metavar='NAME', default=['DFS', 'BFS', 'PriorityDFS', 'AStar'])
+    command.add_argument('--size', type=int, nargs=2, default=(40, 40), metavar=('COLS', 'ROWS'))
+    command.add_argument('--cell-size', type=int, default=10)
+    command.set_defaults(handler=gui, parser=command)
+    return parser
+
+
+def main(argv=None):
+    parser = make_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.handler is bench:
+        return bench(args, extra)
+    if extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
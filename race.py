@@ -0,0 +1,160 @@
+import multiprocessing
+import queue
+import time
+import zlib
+from array import array
+
+import numpy as np
+
+from maze_file import MazeFile
+from maze_graph import compile_maze
+
+
+def encode_trace(cell_ids) -> bytes:
+    """zlib-compressed int32 deltas of a run of visited ids, consecutive visits are mostly +-1 or +-rows apart"""
+    ids = np.asarray(cell_ids, dtype=np.int32)
+    return zlib.compress(np.diff(ids, prepend=0).astype('<i4').tobytes(), 1)
+
+
+def decode_trace(data: bytes) -> np.ndarray:
+    return np.cumsum(np.frombuffer(zlib.decompress(data), dtype='<i4'), dtype=np.int32)
+
+
+def run_solver(index: int, solver_class, maze_path, start: tuple, end: tuple, messages, chunk_size: int):
+    """Worker process: solve the shared maze file, streaming the visit trace in compressed chunks.
+    CPU time covers solving and tracing, measured for this process only; loading and compiling the maze,
+    the same work in every process, is reported apart as setup time."""
+    setup_start = time.process_time()
+    with MazeFile(maze_path) as maze_file:
+        graph = compile_maze(maze_file.maze())
+    cpu_start = time.process_time()
+    setup_time = cpu_start - setup_start
+    solver = solver_class(graph, start, end)
+
+    trace = array('i')
+    while solver.not_finished:
+        solver.move()
+        trace.append(solver.curr_id)
+        if len(trace) == chunk_size:
+            messages.put(('trace', index, encode_trace(trace)))
+            del trace[:]
+    if trace:
+        messages.put(('trace', index, encode_trace(trace)))
+    cpu_time = time.process_time() - cpu_start
+    messages.put(('done', index, solver.nodes_expanded, cpu_time, setup_time, len(solver.path())))
+
+
+class SolverRace:
+    """Runs every solver class in its own process on one saved maze file, which each worker memory-maps
+    read-only. Visit traces arrive in chunks through poll(), so replay can start before the slowest solver ends."""
+
+    def __init__(self, solver_classes: list, maze_path, start: tuple = (0, 0), end: tuple = None,
+                 chunk_size: int = 4096):
+        self.solver_classes = solver_classes
+        self.maze_path = maze_path
+        self.start, self.end = start, end
+        self.chunk_size = chunk_size
+        # Spawned, not forked: races are started from worker threads and a fork would copy locks held by others
+        self.context = multiprocessing.get_context('spawn')
+        self.messages = self.context.Queue()
+        self.processes = []
+        self.chunks = [[] for _ in solver_classes]
+        self.trace_lengths = [0] * len(solver_classes)
+        self.traces = [np.empty(0, dtype=np.int32) for _ in solver_classes]
+        self.results = [None] * len(solver_classes)
+
+    def start_processes(self):
+        for index, solver_class in enumerate(self.solver_classes):
+            process = self.context.Process(target=run_solver, daemon=True,
+                                           args=(index, solver_class, self.maze_path, self.start, self.end,
+                                                 self.messages, self.chunk_size))
+            process.start()
+            self.processes.append(process)
+        return self
+
+    def poll(self, timeout: float = 0) -> bool:
+        """Take in every message waiting, True if any arrived. A solver whose process exited without
+        reporting, e.g. because it raised, gets a failed result so the race still finishes."""
+        # Exited processes are noted before draining, whatever they sent is in the pipe by then
+        exited = [index for index, process in enumerate(self.processes)
+                  if self.results[index] is None and process.exitcode is not None]
+        received = False
+        while True:
+            try:
+                if timeout and not received:
+                    message = self.messages.get(timeout=timeout)
+                else:
+                    message = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            received = True
+            kind, index = message[:2]
+            if kind == 'trace':
+                chunk = decode_trace(message[2])
+                self.chunks[index].append(chunk)
+                self.trace_lengths[index] += len(chunk)
+            else:
+                steps, cpu_time, setup_time, path_length = message[2:]
+                self.results[index] = {'solver': self.solver_classes[index].__name__, 'steps': steps,
+                                       'cpu_time': cpu_time, 'setup_time': setup_time, 'path_length': path_length,
+                                       'failed': False}
+
+        for index in exited:
+            if self.results[index] is None:
+                self.results[index] = {'solver': self.solver_classes[index].__name__,
+                                       'steps': self.trace_lengths[index], 'cpu_time': None, 'setup_time': None,
+                                       'path_length': None, 'failed': True, 'exitcode': self.processes[index].exitcode}
+                received = True
+        return received
+
+    def trace(self, index: int) -> np.ndarray:
+        """Visited ids of one solver received so far, in visiting order"""
+        if self.chunks[index]:
+            self.traces[index] = np.concatenate([self.traces[index]] + self.chunks[index])
+            self.chunks[index] = []
+        return self.traces[index]
+
+    @property
+    def finished(self) -> bool:
+        return all(result is not None for result in self.results)
+
+    def stop(self):
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            process.join()
+
+    def run(self) -> list:
+        """Race to the end without a display, returns the per-solver results"""
+        self.start_processes()
+        try:
+            while not self.finished:
+                self.poll(timeout=0.1)
+        finally:
+            self.stop()
+        return self.results
+
+
+if __name__ == '__main__':
+    import os
+    import random
+    import tempfile
+    from maze_file import save_maze
+    from maze_generators import RandomizedDFS, maze_filler
+    from maze_solvers import DFS, BFS, PriorityDFS, AStar, BidirectionalBFS
+    from tools import create_empty_maze
+
+    size = (300, 300)
+    maze = create_empty_maze(*size)
+    maze_filler(maze, RandomizedDFS(size, rng=random.Random(0)))
+    maze_path = os.path.join(tempfile.gettempdir(), 'race.maze')
+    save_maze(maze_path, maze)
+
+    race = SolverRace([DFS, BFS, PriorityDFS, AStar, BidirectionalBFS], maze_path)
+    for result in race.run():
+        if result['failed']:
+            print(f"{result['solver']:<18} failed with exit code {result['exitcode']} after {result['steps']} steps")
+        else:
+            print(f"{result['solver']:<18} {result['steps']:>8} steps {result['cpu_time'] * 1000:8.1f} ms CPU "
+                  f"(+{result['setup_time'] * 1000:.1f} ms setup), path of {result['path_length']} cells")
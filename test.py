@@ -0,0 +1,258 @@
+import random
+
+import numpy as np
+import pytest
+
+import bulk
+import export
+from analysis import (analyze, analyze_chunk, bfs_field, distance_field, field_path, field_stats, flood,
+                      inconsistent_walls, open_passages, open_sides)
+from chunks import ChunkedMaze
+from maze_file import HEADER, MazeFile, load_maze, save_maze, save_rows
+from instrumentation import Recorder
+from maze_generators import Eller, HuntAndKill, RandomizedKruskal, RandomizedPrim, maze_filler
+from maze_graph import compile_maze
+from maze_solvers import AStar, BFS, BidirectionalBFS, DFS, PriorityDFS
+from tools import ALL_BORDERS, create_empty_maze
+from tree_index import TreeIndex
+
+SIZES = [(1, 1), (1, 9), (9, 1), (2, 2), (7, 13), (16, 5)]
+
+
+def make_maze(size: tuple, generator_class=RandomizedKruskal, seed: int = 0):
+    maze = create_empty_maze(*size)
+    maze_filler(maze, generator_class(size, rng=random.Random(seed)))
+    return maze
+
+
+def add_loops(maze, count: int, seed: int = 0):
+    """Open count random inner walls, so the maze has more than one route between cells"""
+    cols, rows = maze.size
+    rng = random.Random(seed)
+    for _ in range(count):
+        y, x = rng.randrange(cols), rng.randrange(rows)
+        if rng.random() < 0.5 and x + 1 < rows:
+            maze.carve((y, x + 1), (y, x))
+        elif y + 1 < cols:
+            maze.carve((y + 1, x), (y, x))
+    return maze
+
+
+def assert_valid_path(maze, path, start_id: int, end_id: int):
+    rows = maze.size[1]
+    right, down, left, up = (side.ravel() for side in open_sides(maze.walls))
+    assert path[0] == start_id and path[-1] == end_id
+    for cell_id, next_id in zip(path[:-1].tolist(), path[1:].tolist()):
+        step = next_id - cell_id
+        assert (step == 1 and right[cell_id]) or (step == rows and down[cell_id]) \
+            or (step == -1 and left[cell_id]) or (step == -rows and up[cell_id])
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_maze_file_round_trip(tmp_path, size):
+    maze = add_loops(make_maze(size), 3)
+    path = BFS(maze).solve()
+    save_maze(tmp_path / 'maze.bin', maze, path)
+
+    loaded, loaded_path = load_maze(tmp_path / 'maze.bin')
+    assert loaded == maze
+    assert np.array_equal(loaded_path, path)
+    with MazeFile(tmp_path / 'maze.bin') as maze_file:
+        for y_start in range(size[0] + 1):
+            for y_stop in range(y_start, size[0] + 1):
+                assert np.array_equal(maze_file.walls(y_start, y_stop), maze.walls[y_start:y_stop])
+
+
+def test_maze_file_path_offset_is_aligned(tmp_path):
+    for rows in range(1, 20):
+        maze = make_maze((3, rows))
+        save_maze(tmp_path / 'maze.bin', maze, BFS(maze).solve())
+        path_offset = HEADER.unpack((tmp_path / 'maze.bin').read_bytes()[:HEADER.size])[5]
+        assert path_offset % 4 == 0
+        assert np.array_equal(load_maze(tmp_path / 'maze.bin')[1], BFS(maze).solve())
+
+
+def test_maze_file_without_path(tmp_path):
+    maze = make_maze((5, 8))
+    save_maze(tmp_path / 'maze.bin', maze)
+    loaded, path = load_maze(tmp_path / 'maze.bin')
+    assert loaded == maze and path is None
+
+
+@pytest.mark.parametrize('size', [(1, 1), (1, 6), (6, 1), (9, 14)])
+def test_save_rows_matches_eller_moves(tmp_path, size):
+    rows_written = save_rows(tmp_path / 'maze.bin', Eller(size, rng=random.Random(3)).iter_rows(), size[1],
+                             batch_rows=4)
+    assert rows_written == size[0]
+    assert load_maze(tmp_path / 'maze.bin')[0] == make_maze(size, Eller, seed=3)
+
+
+@pytest.mark.parametrize('solver_class', [BFS, AStar, BidirectionalBFS])
+@pytest.mark.parametrize('size', SIZES + [(30, 40)])
+def test_shortest_solvers_match_bfs_field(solver_class, size):
+    maze = add_loops(make_maze(size, seed=1), size[0] * size[1] // 8, seed=2)
+    graph = compile_maze(maze)
+    distances = bfs_field(maze)[0]
+    rng = random.Random(4)
+    for _ in range(5):
+        end = (rng.randrange(size[0]), rng.randrange(size[1]))
+        path = solver_class(graph, (0, 0), end).solve()
+        assert len(path) - 1 == distances[end]
+        assert_valid_path(maze, path, 0, graph.cell_id(end))
+
+
+@pytest.mark.parametrize('solver_class', [DFS, PriorityDFS])
+def test_other_solvers_find_valid_paths(solver_class):
+    maze = add_loops(make_maze((20, 25), seed=5), 60, seed=6)
+    path = solver_class(maze).solve()
+    assert_valid_path(maze, path, 0, 20 * 25 - 1)
+
+
+@pytest.mark.parametrize('size', SIZES + [(25, 31)])
+def test_tree_index_matches_bfs(size):
+    maze = make_maze(size, RandomizedPrim if size != (1, 1) else RandomizedKruskal, seed=7)
+    graph = compile_maze(maze)
+    index = TreeIndex(graph)
+    rng = np.random.default_rng(8)
+    starts, ends = rng.integers(0, len(graph), (2, 20))
+
+    distances = index.distances(starts, ends)
+    for start, end, distance, path in zip(starts.tolist(), ends.tolist(), distances, index.paths(starts, ends)):
+        start_pos, end_pos = graph.cell_pos(start), graph.cell_pos(end)
+        assert distance == bfs_field(maze, start_pos)[0][end_pos]
+        assert len(path) - 1 == distance
+        assert_valid_path(maze, path, start, end)
+
+
+def test_tree_index_rejects_mazes_with_loops():
+    maze = add_loops(make_maze((10, 10)), 10)
+    with pytest.raises(ValueError):
+        TreeIndex(maze)
+
+
+@pytest.mark.parametrize('size', SIZES + [(40, 35)])
+def test_bfs_field_matches_dense_distance_field(size):
+    maze = add_loops(make_maze(size, seed=11), size[0] * size[1] // 10, seed=12)
+    source = (size[0] // 2, size[1] // 3)
+    dense = distance_field(maze.walls[None], source)[0]
+    for small_frontier in (0, 4, 32, 10 ** 6):  # Array levels only, mixed, Python levels only
+        distances, parent_sides = bfs_field(maze, source, small_frontier)
+        assert np.array_equal(distances, dense)
+
+        end = (size[0] - 1, size[1] - 1)
+        path = field_path(distances, parent_sides, end)
+        assert len(path) - 1 == distances[end]
+        assert_valid_path(maze, path, source[0] * size[1] + source[1], size[0] * size[1] - 1)
+
+
+@pytest.mark.parametrize('size', SIZES + [(33, 47)])
+@pytest.mark.parametrize('batch_size', [1, 7, 4096])
+def test_kruskal_batches_match_moves(size, batch_size):
+    stepped = RandomizedKruskal(size, rng=random.Random(9))
+    events = []
+    while stepped.not_finished:
+        stepped.move()
+        events.append((stepped.curr_id, stepped.prev_id))
+
+    batched = RandomizedKruskal(size, rng=random.Random(9))
+    batches = list(batched.iter_batches(batch_size))
+    batch_events = np.concatenate(batches) if batches else np.empty((0, 2), dtype=np.int32)
+    assert batch_events.tolist() == [list(event) for event in events]
+    assert not batched.not_finished
+    assert batched.visited_count == stepped.visited_count == size[0] * size[1]
+    assert (batched.curr_id, batched.prev_id) == (stepped.curr_id, stepped.prev_id)
+
+
+def test_kruskal_makes_perfect_mazes():
+    recorder = Recorder()
+    maze = create_empty_maze(40, 30)
+    maze_filler(maze, RandomizedKruskal((40, 30), rng=random.Random(10)), recorder=recorder)
+    graph = compile_maze(maze)
+    assert len(graph.neighbors) == 2 * (len(graph) - 1)
+    assert (bfs_field(maze)[0] >= 0).all()
+    assert recorder.steps == len(graph) - 1 and recorder.revisits == 0
+
+
+def test_bulk_file_is_identical_for_any_worker_count(tmp_path):
+    jobs = bulk.make_jobs(RandomizedKruskal, (9, 13), 24, base_seed=5)
+    bulk.write_bulk(tmp_path / 'serial.bin', jobs, workers=1)
+    bulk.write_bulk(tmp_path / 'parallel.bin', jobs, workers=3, ordered=False)
+    assert (tmp_path / 'serial.bin').read_bytes() == (tmp_path / 'parallel.bin').read_bytes()
+    assert bulk.read_bulk(tmp_path / 'serial.bin', (9, 13))[7].tobytes() == bulk.generate_maze(jobs[7]).walls.tobytes()
+
+
+def test_chunk_seams_agree_and_survive_eviction():
+    world = ChunkedMaze((6, 7), RandomizedKruskal, seed=3, cache_size=2, seam_passages=2)
+    region = world.region(-6, -7, 18, 21)  # 3 x 3 chunks around the origin
+    assert inconsistent_walls(region.walls) == 0
+    east, south = open_passages(region.walls)
+    for i in range(3):
+        for boundary in (1, 2):
+            assert east[i * 6:(i + 1) * 6, boundary * 7 - 1].sum() == 2
+            assert south[boundary * 6 - 1, i * 7:(i + 1) * 7].sum() == 2
+    assert (bfs_field(region)[0] >= 0).all()
+
+    fresh = ChunkedMaze((6, 7), RandomizedKruskal, seed=3, cache_size=64, seam_passages=2)
+    assert fresh.region(-6, -7, 18, 21) == region
+    assert world.region(-6, -7, 18, 21) == region
+    assert world.misses > 9  # The small cache evicted chunks that were then rebuilt
+
+
+def test_analyze_counts_cell_shapes():
+    open_grid = np.zeros((3, 3), dtype=np.uint8)
+    open_grid[0] |= 1
+    open_grid[:, -1] |= 2
+    open_grid[-1] |= 4
+    open_grid[:, 0] |= 8
+    results = analyze(open_grid)
+    assert results['passages'][0] == 12 and results['junctions'][0] == 5 and results['turns'][0] == 4
+    assert results['dead_ends'][0] == 0 and results['straight_corridors'][0] == 0
+    assert results['mean_branching'][0] == pytest.approx(3.2)
+    assert results['connected'][0] and not results['perfect'][0]
+    assert results['solution_length'][0] == 4 and results['max_distance'][0] == 4
+
+    closed = analyze(np.full((1, 4, 5), ALL_BORDERS, dtype=np.uint8))
+    assert closed['isolated'][0] == 20 and closed['reachable'][0] == 1
+    assert closed['solution_length'][0] == -1 and not closed['connected'][0]
+
+
+def test_analyze_large_maze_matches_bfs_field():
+    maze = add_loops(make_maze((150, 120), seed=13), 300, seed=14)
+    distances = bfs_field(maze)[0]
+    results = analyze(maze)
+    assert results['solution_length'][0] == distances[-1, -1]
+    assert results['max_distance'][0] == distances.max()
+    assert results['reachable'][0] == 150 * 120 and not results['perfect'][0]
+    assert results['inconsistent_walls'][0] == 0
+
+
+def test_flood_matches_field_stats_on_batches():
+    walls = np.stack([add_loops(make_maze((9, 11), seed=seed), seed % 5, seed=seed).walls for seed in range(70)])
+    walls[3] = ALL_BORDERS  # Nothing reachable
+    for start, end in (((0, 0), (8, 10)), ((4, 5), (4, 5)), ((8, 0), (0, 10))):
+        for flooded, fielded in zip(flood(walls, start, end), field_stats(walls, start, end)):
+            assert np.array_equal(flooded, fielded)
+    results = analyze_chunk(walls, (0, 0), (8, 10))
+    assert results['perfect'][[0, 5, 10]].all() and not results['perfect'][3]
+
+
+def test_band_raster_matches_single_band(tmp_path):
+    maze = add_loops(make_maze((23, 17), seed=15), 20, seed=16)
+    solver = BFS(maze)
+    overlays = {'path': solver.solve(), 'visited': solver.visited_ids()}
+    whole = np.concatenate(list(export.iter_bands(maze, 5, 2, band_rows=23, **overlays)))
+    assert whole.shape[:2] == export.image_size(maze, 5, 2)[::-1]
+    for band_rows in (1, 4, 7):
+        assert np.array_equal(np.concatenate(list(export.iter_bands(maze, 5, 2, band_rows, **overlays))), whole)
+
+    export.write_ppm(tmp_path / 'bands.ppm', maze, 5, 2, band_rows=3, **overlays)
+    assert (tmp_path / 'bands.ppm').read_bytes().endswith(whole.tobytes())
+
+
+@pytest.mark.parametrize('size', [(1, 6), (6, 1), (2, 2), (12, 17)])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_heap_hunt_matches_scan_hunt(size, seed):
+    heap_events = list(HuntAndKill(size, rng=random.Random(seed)))
+    scan_events = list(HuntAndKill(size, show_scan=True, rng=random.Random(seed)))
+    assert heap_events == scan_events
+    assert len(heap_events) == size[0] * size[1] - 1
@@ -1,29 +1,170 @@
-class Cell:
-    def __init__(self, top=1, bottom=1, left=1, right=1):
-        self.top = top
-        self.bottom = bottom
-        self.left = left
-        self.right = right
+from array import array
 
+import numpy as np
+
+TOP, RIGHT, BOTTOM, LEFT = 1, 2, 4, 8
+ALL_BORDERS = TOP | RIGHT | BOTTOM | LEFT
 
 directions = {(0, 1): 'right', (1, 0): 'bottom', (0, -1): 'left', (-1, 0): 'top', (0, 0): None}
+direction_bits = {(0, 1): RIGHT, (1, 0): BOTTOM, (0, -1): LEFT, (-1, 0): TOP, (0, 0): 0}
+border_bits = {'top': TOP, 'right': RIGHT, 'bottom': BOTTOM, 'left': LEFT}
+opposite_bits = {TOP: BOTTOM, RIGHT: LEFT, BOTTOM: TOP, LEFT: RIGHT, 0: 0}
+
+
+class CellView:
+    """Adapter giving one cell of a Maze the old top/right/bottom/left attributes"""
+    __slots__ = ('walls', 'y', 'x')
+
+    def __init__(self, walls: np.ndarray, y: int, x: int):
+        self.walls = walls
+        self.y = y
+        self.x = x
+
+    def _get(self, bit: int) -> int:
+        return 1 if self.walls[self.y, self.x] & bit else 0
+
+    def _set(self, bit: int, value: int):
+        if value:
+            self.walls[self.y, self.x] |= bit
+        else:
+            self.walls[self.y, self.x] &= ALL_BORDERS ^ bit
+
+    top = property(lambda self: self._get(TOP), lambda self, value: self._set(TOP, value))
+    right = property(lambda self: self._get(RIGHT), lambda self, value: self._set(RIGHT, value))
+    bottom = property(lambda self: self._get(BOTTOM), lambda self, value: self._set(BOTTOM, value))
+    left = property(lambda self: self._get(LEFT), lambda self, value: self._set(LEFT, value))
+
+    @property
+    def mask(self) -> int:
+        return int(self.walls[self.y, self.x])
+
+
+class MazeRow:
+    __slots__ = ('walls', 'y')
+
+    def __init__(self, walls: np.ndarray, y: int):
+        self.walls = walls
+        self.y = y
+
+    def __len__(self):
+        return self.walls.shape[1]
+
+    def __getitem__(self, x: int) -> CellView:
+        return CellView(self.walls, self.y, x)
+
+    def __iter__(self):
+        for x in range(self.walls.shape[1]):
+            yield CellView(self.walls, self.y, x)
+
+
+class Maze:
+    """Grid of cells stored as one uint8 wall bitmask per cell (TOP | RIGHT | BOTTOM | LEFT)"""
+
+    def __init__(self, cols: int, rows: int, walls: np.ndarray = None):
+        self.cols, self.rows = cols, rows
+        if walls is None:
+            walls = np.full((cols, rows), ALL_BORDERS, dtype=np.uint8)
+        self.walls = walls
+
+    def __len__(self):
+        return self.cols
+
+    def __getitem__(self, y: int) -> MazeRow:
+        return MazeRow(self.walls, y)
+
+    def __iter__(self):
+        for y in range(self.cols):
+            yield MazeRow(self.walls, y)
+
+    def __eq__(self, other):
+        if not isinstance(other, Maze):
+            return NotImplemented
+        return np.array_equal(self.walls, other.walls)
+
+    __hash__ = None
+
+    @property
+    def size(self) -> tuple:
+        return self.cols, self.rows
+
+    def copy(self):
+        return Maze(self.cols, self.rows, self.walls.copy())
+
+    def carve(self, pos: tuple, prev_pos: tuple):
+        """Remove the wall between two neighbouring cells, no-op if they are the same cell"""
+        bit = direction_bits[get_direction(pos, prev_pos)]
+        if not bit:
+            return
+        y, x = pos
+        prev_y, prev_x = prev_pos
+        self.walls[y, x] &= ALL_BORDERS ^ bit
+        self.walls[prev_y, prev_x] &= ALL_BORDERS ^ opposite_bits[bit]
+
+    def carve_events(self, events: np.ndarray):
+        """Bulk carve for an (k, 2) array of (cell id, neighbor id) pairs, ids are y * rows + x"""
+        cells, neighbors = events[:, 0], events[:, 1]
+        cell_y, cell_x = np.divmod(cells, self.rows)
+        neighbor_y, neighbor_x = np.divmod(neighbors, self.rows)
+        dy, dx = neighbor_y - cell_y, neighbor_x - cell_x
+        bits = np.select([dx == 1, dy == 1, dx == -1, dy == -1], [RIGHT, BOTTOM, LEFT, TOP], 0).astype(np.uint8)
+        opposite = ((bits << 2) | (bits >> 2)) & ALL_BORDERS
+        np.bitwise_and.at(self.walls, (cell_y, cell_x), ~bits)
+        np.bitwise_and.at(self.walls, (neighbor_y, neighbor_x), ~opposite)
+
+
+class RandomIdSet:
+    """Set of integer ids below capacity with constant-time random pick-and-remove, removed slots are filled
+    with the last item. Items and their positions are kept in typed arrays."""
+
+    def __init__(self, capacity: int, items=()):
+        self.items = array('i')
+        self.positions = array('i', [-1]) * capacity
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return self.positions[item] >= 0
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def add(self, item):
+        if self.positions[item] < 0:
+            self.positions[item] = len(self.items)
+            self.items.append(item)
 
+    def remove(self, item):
+        index = self.positions[item]
+        self.positions[item] = -1
+        last = self.items.pop()
+        if index < len(self.items):
+            self.items[index] = last
+            self.positions[last] = index
+
+    def pop_random(self, rng):
+        item = self.items[rng.randrange(len(self.items))]
+        self.remove(item)
+        return item
 
-def remove_all_borders(cell: Cell):
+
+def remove_all_borders(cell: CellView):
     cell.top = 0
     cell.bottom = 0
     cell.left = 0
     cell.right = 0
 
 
-def add_all_borders(cell: Cell):
+def add_all_borders(cell: CellView):
     cell.top = 1
     cell.bottom = 1
     cell.left = 1
     cell.right = 1
 
 
-def add_border(cell: Cell, direction: str):
+def add_border(cell: CellView, direction: str):
     if direction == 'top':
         cell.top = 1
     if direction == 'bottom':
@@ -34,7 +175,7 @@ def add_border(cell: Cell, direction: str):
         cell.right = 1
 
 
-def remove_border(cell: Cell, direction: str):
+def remove_border(cell: CellView, direction: str):
     if direction == 'top':
         cell.top = 0
     if direction == 'bottom':
@@ -70,29 +211,12 @@ def manhattan_distance(start: tuple, end: tuple) -> int:
     return dist
 
 
-def create_empty_maze(cols: int, rows: int) -> list[list]:
-    matrix = []
-    for y in range(cols):
-        row = []
-        for x in range(rows):
-            cell = Cell()
-            row.append(cell)
-        matrix.append(row)
-    return matrix
+def create_empty_maze(cols: int, rows: int) -> Maze:
+    return Maze(cols, rows)
 
 
-def deep_copy(matrix: list[list]) -> list[list]:
-    new_matrix = []
-    cols, rows = len(matrix), len(matrix[0])
-    for y in range(cols):
-        row = []
-        for x in range(rows):
-            cell = matrix[y][x]
-            args = cell.__dict__
-            new_cell = Cell(top=args['top'], bottom=args['bottom'], left=args['left'], right=args['right'])
-            row.append(new_cell)
-        new_matrix.append(row)
-    return new_matrix
+def deep_copy(matrix: Maze) -> Maze:
+    return matrix.copy()
 
 
 if __name__ == '__main__':
@@ -102,5 +226,7 @@ if __name__ == '__main__':
 
     cell = maze[0][0]
     cell_copy = maze_copy[0][0]
-    print(cell.__dict__ == cell_copy.__dict__)
-    print(cell == cell_copy)
+    print(cell.mask == cell_copy.mask)
+    print(maze == maze_copy)
+    maze.carve((0, 0), (0, 1))
+    print(maze[0][0].right, maze[0][1].left, maze == maze_copy)
@@ -0,0 +1,122 @@
+import numpy as np
+
+from maze_graph import MazeGraph, compile_maze
+
+
+class TreeIndex:
+    """Route index for perfect mazes, which are spanning trees: the tree is rooted once and a binary lifting
+    table (up[k][i] is the 2 ** k-th ancestor of cell i) answers lowest common ancestor queries in O(log n).
+    Distances follow from depths, paths are walked up from both ends to the ancestor in O(path length).
+    Cells are ids y * rows + x, the batch methods take and return NumPy arrays of them."""
+
+    def __init__(self, maze, root: tuple = (0, 0)):
+        self.graph = maze if isinstance(maze, MazeGraph) else compile_maze(maze)
+        size = len(self.graph)
+        if len(self.graph.neighbors) != 2 * (size - 1):
+            raise ValueError('TreeIndex needs a perfect maze, '
+                             f'{len(self.graph.neighbors) // 2} passages found for {size} cells')
+
+        self.root = self.graph.cell_id(root)
+        parents, depths, reached = self.root_tree(self.root)
+        if reached != size:
+            raise ValueError('TreeIndex needs a perfect maze, not every cell is reachable')
+        self.parent_list = parents
+        self.parents = np.array(parents, dtype=np.int32)
+        self.depths = np.array(depths, dtype=np.int32)
+
+        levels = max(1, int(self.depths.max()).bit_length())
+        self.up = np.empty((levels, size), dtype=np.int32)
+        self.up[0] = self.parents
+        for level in range(1, levels):
+            self.up[level] = self.up[level - 1][self.up[level - 1]]
+
+    def root_tree(self, root: int) -> tuple:
+        """Parent and depth lists from a BFS and the number of cells reached, the root is its own parent"""
+        offsets, neighbors = self.graph.offset_list, self.graph.neighbor_list
+        parents = [-1] * len(self.graph)
+        depths = [0] * len(self.graph)
+        parents[root] = root
+        order = [root]
+        for cell_id in order:  # Grows while iterating
+            depth = depths[cell_id] + 1
+            for passage in neighbors[offsets[cell_id]:offsets[cell_id + 1]]:
+                if parents[passage] == -1:
+                    parents[passage] = cell_id
+                    depths[passage] = depth
+                    order.append(passage)
+        return parents, depths, len(order)
+
+    def lca_batch(self, starts, ends) -> np.ndarray:
+        up, depths = self.up, self.depths
+        starts, ends = np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64)
+        deeper = depths[starts] < depths[ends]
+        low, high = np.where(deeper, ends, starts), np.where(deeper, starts, ends)
+
+        difference = depths[low] - depths[high]
+        for level in range(len(up)):
+            low = np.where((difference >> level) & 1 == 1, up[level][low], low)
+
+        same = low == high
+        for level in range(len(up) - 1, -1, -1):
+            low_up, high_up = up[level][low], up[level][high]
+            apart = low_up != high_up
+            low, high = np.where(apart, low_up, low), np.where(apart, high_up, high)
+        return np.where(same, low, up[0][low]).astype(np.int32)
+
+    def distances(self, starts, ends) -> np.ndarray:
+        """Number of steps between each start and end cell"""
+        starts, ends = np.asarray(starts), np.asarray(ends)
+        ancestors = self.lca_batch(starts, ends)
+        return self.depths[starts] + self.depths[ends] - 2 * self.depths[ancestors]
+
+    def paths(self, starts, ends) -> list:
+        return [self.walk(start, end, ancestor) for start, end, ancestor
+                in zip(np.asarray(starts).tolist(), np.asarray(ends).tolist(), self.lca_batch(starts, ends).tolist())]
+
+    def walk(self, start: int, end: int, ancestor: int) -> np.ndarray:
+        parents = self.parent_list
+        head, tail = [], []
+        while start != ancestor:
+            head.append(start)
+            start = parents[start]
+        while end != ancestor:
+            tail.append(end)
+            end = parents[end]
+        head.append(ancestor)
+        head.extend(reversed(tail))
+        return np.array(head, dtype=np.int32)
+
+    def distance(self, start: tuple, end: tuple) -> int:
+        cell_id = self.graph.cell_id
+        return int(self.distances([cell_id(start)], [cell_id(end)])[0])
+
+    def path(self, start: tuple, end: tuple) -> np.ndarray:
+        """Cell ids from start to end, like the solvers' path()"""
+        return self.paths([self.graph.cell_id(start)], [self.graph.cell_id(end)])[0]
+
+
+if __name__ == '__main__':
+    import random
+    from time import perf_counter
+    from maze_generators import RandomizedDFS, maze_filler
+    from maze_solvers import BFS
+    from tools import create_empty_maze
+
+    size = (300, 300)
+    maze = create_empty_maze(*size)
+    maze_filler(maze, RandomizedDFS(size, rng=random.Random(0)))
+    graph = compile_maze(maze)
+
+    start = perf_counter()
+    index = TreeIndex(graph)
+    print(f'index built in {perf_counter() - start:.3f} s')
+
+    rng = np.random.default_rng(0)
+    starts, ends = rng.integers(0, len(graph), (2, 100000))
+    start = perf_counter()
+    distances = index.distances(starts, ends)
+    print(f'{len(starts)} distance queries in {perf_counter() - start:.3f} s')
+
+    solver = BFS(graph, start=graph.cell_pos(int(starts[0])), end=graph.cell_pos(int(ends[0])))
+    print('matches BFS:', np.array_equal(solver.solve(), index.paths(starts[:1], ends[:1])[0]),
+          len(solver.path()) - 1 == distances[0])
@@ -0,0 +1,169 @@
+import queue
+import threading
+from collections import deque
+from time import perf_counter, sleep
+
+MIN_STEPS_PER_SECOND = 0.5
+MAX_STEPS_PER_SECOND = 2 ** 20
+
+
+class StepScheduler:
+    """Runs as many steps as fit into one frame: at most frame_budget seconds of work, and when steps_per_second
+    is set, only the steps owed to that rate since the last frame. The achieved rate is measured over the frames
+    of the last `window` seconds."""
+
+    def __init__(self, steps_per_second=1.0, frame_budget=0.012, max_lag=0.25, window=1.0):
+        self.steps_per_second = steps_per_second
+        self.frame_budget = frame_budget
+        self.max_lag = max_lag
+        self.window = window
+        self.owed = 0.0
+        self.last_time = perf_counter()
+        self.frames = deque()
+
+    def reset(self):
+        self.owed = 0.0
+        self.last_time = perf_counter()
+        self.frames.clear()
+
+    def run(self, step) -> int:
+        """Call step() until it returns False, the frame budget is spent or the owed steps are done"""
+        now = perf_counter()
+        elapsed, self.last_time = now - self.last_time, now
+        if self.steps_per_second is None:
+            allowed = float('inf')
+        else:
+            self.owed = min(self.owed + elapsed * self.steps_per_second, self.max_lag * self.steps_per_second + 1)
+            allowed = int(self.owed)
+
+        deadline = now + self.frame_budget
+        steps = 0
+        while steps < allowed and step():
+            steps += 1
+            if perf_counter() >= deadline:
+                break
+        if self.steps_per_second is not None:
+            self.owed -= steps
+
+        self.frames.append((now, steps))
+        while now - self.frames[0][0] > self.window:
+            self.frames.popleft()
+        return steps
+
+    @property
+    def step_rate(self) -> float:
+        frames = list(self.frames)  # Copied in one go, a worker thread may be appending
+        if len(frames) < 2:
+            return 0.0
+        duration = frames[-1][0] - frames[0][0]
+        return sum(steps for _, steps in frames) / duration if duration else 0.0
+
+    def faster(self):
+        if self.steps_per_second is not None:
+            self.steps_per_second *= 2
+            if self.steps_per_second > MAX_STEPS_PER_SECOND:
+                self.steps_per_second = None
+
+    def slower(self):
+        if self.steps_per_second is None:
+            self.steps_per_second = MAX_STEPS_PER_SECOND
+        else:
+            self.steps_per_second = max(self.steps_per_second / 2, MIN_STEPS_PER_SECOND)
+
+
+class AlgorithmWorker:
+    """Steps algorithms on a background thread so the UI never blocks on them.
+    step(emit) advances every algorithm once, passes drawing events to emit and returns False when all are done.
+    Events of one frame (as many steps as the scheduler allows) go into a bounded queue as one batch,
+    a full queue stalls the worker until the UI drains it. setup(emit, stopped), if given, runs first on the worker
+    and should return early once the stopped event is set; teardown() runs when the worker ends, finished or stopped."""
+
+    def __init__(self, step, scheduler, setup=None, teardown=None, frame_time=1 / 60, max_batches=2):
+        self.step = step
+        self.setup = setup
+        self.teardown = teardown
+        self.scheduler = scheduler
+        self.frame_time = frame_time
+        self.events = queue.Queue(maxsize=max_batches)
+        self.resumed = threading.Event()
+        self.stopped = threading.Event()
+        self.finished = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self, paused=True):
+        if not paused:
+            self.resume()
+        self.thread.start()
+        return self
+
+    def pause(self):
+        self.resumed.clear()
+
+    def resume(self):
+        self.scheduler.reset()
+        self.resumed.set()
+
+    @property
+    def paused(self) -> bool:
+        return not self.resumed.is_set()
+
+    def stop(self):
+        """Stop the thread and drop whatever it has queued, safe to call while the queue is full"""
+        self.stopped.set()
+        self.resumed.set()
+        while self.thread.is_alive():
+            self.drain()
+            self.thread.join(0.01)
+        self.drain()
+
+    def drain(self, max_batches=None) -> list:
+        """Queued events in order, without waiting"""
+        events = []
+        while max_batches is None or max_batches > 0:
+            try:
+                events.extend(self.events.get_nowait())
+            except queue.Empty:
+                break
+            if max_batches is not None:
+                max_batches -= 1
+        return events
+
+    def post(self, batch: list):
+        while not self.stopped.is_set():
+            try:
+                self.events.put(batch, timeout=0.05)
+                return
+            except queue.Full:
+                continue
+
+    def run(self):
+        try:
+            self.run_steps()
+        finally:
+            if self.teardown is not None:
+                self.teardown()
+
+    def run_steps(self):
+        batch = []
+        if self.setup is not None:
+            self.setup(batch.append, self.stopped)
+            self.post(batch)
+            batch = []
+
+        def step():
+            if self.step(batch.append):
+                return True
+            self.finished = True
+            return False
+
+        while not self.stopped.is_set() and not self.finished:
+            if not self.resumed.wait(0.05):
+                continue
+            start = perf_counter()
+            self.scheduler.run(step)
+            if batch:
+                self.post(batch)
+                batch = []
+            remaining = self.frame_time - (perf_counter() - start)
+            if remaining > 0 and not self.finished:
+                sleep(remaining)